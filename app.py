@@ -1,14 +1,24 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_wtf.csrf import CSRFProtect
 from config import Config, Permissions
-from models import db, User, Device, AuditLog, Permission, Language, Translation
-from cisco_driver import CiscoVGDriver
+from models import db, User, Device, AuditLog, Permission, Language, Translation, ConfigSnapshot, ConfigJob, upgrade_schema
+from cisco_driver import CiscoVGDriver, DEFAULT_RULE_SET, parse_rule_csv, forget_unsupported
+from services.device_executor import device_executor, DeviceBusyError
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import re
+import time
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Compile templates per language, with constant translation keys inlined
+from services.translation_service import TranslatingEnvironment
+app.jinja_environment = TranslatingEnvironment
+
 # Initialize CSRF protection
 csrf = CSRFProtect(app)
 
@@ -20,10 +30,54 @@ login_manager.login_view = 'login'
 from services.translation_service import translation_service
 translation_service.init_app(app)
 
+# Initialize device session pool
+from services.session_pool import session_pool
+session_pool.init_app(app)
+
+# Initialize translation-rule snapshot cache
+from services.rule_cache import rule_cache
+rule_cache.init_app(app)
+
+# Initialize deferred 'write memory' scheduler
+from services.save_scheduler import save_scheduler
+save_scheduler.init_app(app)
+
+# Initialize device I/O worker pool
+device_executor.init_app(app)
+
+# Initialize per-device circuit breakers
+from services.circuit_breaker import device_breakers
+device_breakers.init_app(app)
+
+# Initialize background config poller (started by the server entry points)
+from services.config_poller import config_poller
+config_poller.init_app(app)
+
+# Initialize per-phase device timing spans
+from services.device_timings import device_timings
+device_timings.init_app(app)
+
+# Initialize adaptive netmiko timing profiles
+from services.timing_profiles import timing_profiles
+timing_profiles.init_app(app)
+
+# Initialize config change job queue (dispatcher starts on first job or at server start)
+from services.job_queue import job_queue
+job_queue.init_app(app)
+
+# Initialize number routing simulator (lookups against cached rules)
+from services.number_router import number_router
+number_router.init_app(app)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+@app.context_processor
+def inject_permissions():
+    """Named permission bits for templates, e.g. current_user.can(Permissions.TASK_DIVERT)"""
+    return {'Permissions': Permissions}
+
 @app.cli.command("import-translations")
 def cli_import_translations():
     """Import initial translations into the database"""
@@ -37,7 +91,7 @@ def cli_import_translations():
 @app.cli.command("init-db")
 def init_db():
 
-    db.create_all()
+    upgrade_schema()
 
     # Initialize permissions
     permissions_to_create = [
@@ -119,7 +173,11 @@ def dashboard():
     # Show allowed devices
     devices = Device.query.all()
     allowed_devices = [d for d in devices if current_user.can(d.permission_bit)]
-    return render_template('layout.html', content_type='dashboard', devices=allowed_devices)
+    # Last polled config per device, straight from SQLite
+    snapshots = {s.device_id: s for s in ConfigSnapshot.query.all()}
+    breakers = {d.id: device_breakers.state(d.id) for d in allowed_devices}
+    return render_template('layout.html', content_type='dashboard', devices=allowed_devices, snapshots=snapshots,
+                           breakers=breakers)
 
 @app.route('/diversion/<int:device_id>', methods=['GET', 'POST'])
 @login_required
@@ -131,39 +189,299 @@ def diversion(device_id):
         return redirect(url_for('dashboard'))
 
     driver = CiscoVGDriver(device)
-    
+    snapshot = None
+    rule_set = request.values.get('rule_set', DEFAULT_RULE_SET, type=int)
+    status = 200
+
     # Handle Update
     if request.method == 'POST':
-        rule_id = request.form['rule_id']
-        raw_source = request.form['raw_source']
-        new_dest = request.form['new_dest']
-        
+        if request.form.get('mode') == 'bulk':
+            # Bulk edit: every row with a new destination, pushed in one session
+            changes = []
+            for rule_id in request.form.getlist('rule_id'):
+                new_dest = request.form.get(f'new_dest_{rule_id}', '').strip()
+                if new_dest:
+                    changes.append({
+                        'rule_id': rule_id,
+                        'raw_source': request.form[f'raw_source_{rule_id}'],
+                        'new_destination': new_dest,
+                    })
+        else:
+            changes = [{
+                'rule_id': request.form['rule_id'],
+                'raw_source': request.form['raw_source'],
+                'new_destination': request.form['new_dest'],
+            }]
+
+        if not changes:
+            flash("No changes submitted.")
+        elif job_queue.enabled:
+            # Applied in the background; the page polls the job until it finishes
+            job = job_queue.submit(device.id, current_user.id, rule_set, changes)
+            flash(f"Change queued (job #{job.id}).")
+            return redirect(url_for('diversion', device_id=device.id, rule_set=rule_set,
+                                    bulk=1 if request.form.get('mode') == 'bulk' else None))
+        else:
+            try:
+                # Execute on Cisco; the post-change rules come back from the same session
+                snapshot = driver.update_diversions(changes, rule_set)
+
+                # Log to DB
+                for change in changes:
+                    log = AuditLog(
+                        user_id=current_user.id,
+                        device_name=device.name,
+                        action="Change Diversion",
+                        details=f"Rule-set {rule_set} rule {change['rule_id']}: {change['raw_source']} -> {change['new_destination']}"
+                    )
+                    db.session.add(log)
+                db.session.commit()
+
+                flash("Configuration updated successfully!")
+            except DeviceBusyError as e:
+                flash(f"Error: {e}")
+                status = 503
+            except Exception as e:
+                flash(f"Error: {e}")
+
+    # Rules are rendered inline when the snapshot cache can answer; otherwise the page
+    # is sent right away and the table is loaded from diversion_table(), so a slow or
+    # dead gateway never holds up the page itself
+    refresh = request.args.get('refresh') == '1'
+    if snapshot is None and not refresh:
+        snapshot = driver.cached_snapshot(rule_set)
+    rules = snapshot.get_rules(rule_set) if snapshot is not None else []
+
+    bulk = request.args.get('bulk') == '1' or request.form.get('mode') == 'bulk'
+    save_pending = save_scheduler.pending(device.id)
+    jobs = ConfigJob.query.filter(
+        ConfigJob.device_id == device.id,
+        ConfigJob.created_at >= datetime.utcnow() - timedelta(minutes=10)
+    ).order_by(ConfigJob.id.desc()).limit(10).all()
+    return render_template('diversion.html', device=device, rules=rules, snapshot=snapshot, bulk=bulk,
+                           save_pending=save_pending, rule_set=rule_set, jobs=jobs,
+                           deferred=snapshot is None, refresh=refresh), status
+
+@app.route('/diversion/<int:device_id>/table')
+@login_required
+def diversion_table(device_id):
+    """Rule table fragment for a diversion page that was sent before the rules were read"""
+    device = Device.query.get_or_404(device_id)
+    if not (current_user.can(Permissions.TASK_DIVERT) and current_user.can(device.permission_bit)):
+        return render_template('diversion_table.html', device=device, error="You do not have permission for this task on this device."), 403
+
+    rule_set = request.args.get('rule_set', DEFAULT_RULE_SET, type=int)
+    bulk = request.args.get('bulk') == '1'
+    snapshot = None
+    error = None
+    status = 200
+    try:
+        snapshot = CiscoVGDriver(device).get_snapshot(refresh=request.args.get('refresh') == '1', rule_set=rule_set)
+    except DeviceBusyError as e:
+        error, status = str(e), 503
+    except Exception as e:
+        error, status = f"Could not connect to device: {e}", 502
+
+    rules = snapshot.get_rules(rule_set) if snapshot is not None else []
+    return render_template('diversion_table.html', device=device, rules=rules, snapshot=snapshot,
+                           bulk=bulk, rule_set=rule_set, error=error), status
+
+@app.route('/diversion/<int:device_id>/sync', methods=['GET', 'POST'])
+@login_required
+def diversion_sync(device_id):
+    """Replace a whole rule set with an uploaded table, sending only the lines that differ"""
+    device = Device.query.get_or_404(device_id)
+    if not (current_user.can(Permissions.TASK_DIVERT) and current_user.can(device.permission_bit)):
+        flash("You do not have permission for this task on this device.")
+        return redirect(url_for('dashboard'))
+
+    rule_set = request.values.get('rule_set', DEFAULT_RULE_SET, type=int)
+    rules_csv = request.form.get('rules_csv', '')
+    upload = request.files.get('rules_file')
+    if upload and upload.filename:
+        rules_csv = upload.read().decode('utf-8-sig', errors='replace')
+    commands = None
+    status = 200
+
+    if request.method == 'POST':
+        dry_run = request.form.get('action') != 'apply'
         try:
-            # Execute on Cisco
-            output = driver.update_diversion(rule_id, raw_source, new_dest)
-            
-            # Log to DB
-            log = AuditLog(
-                user_id=current_user.id,
-                device_name=device.name,
-                action="Change Diversion",
-                details=f"Rule {rule_id}: {raw_source} -> {new_dest}"
-            )
-            db.session.add(log)
-            db.session.commit()
-            
-            flash("Configuration updated successfully!")
+            desired = parse_rule_csv(rules_csv)
+            commands = CiscoVGDriver(device).sync_diversions(desired, rule_set, dry_run=dry_run)
+            if not dry_run:
+                if commands:
+                    db.session.add(AuditLog(
+                        user_id=current_user.id,
+                        device_name=device.name,
+                        action="Sync Diversions",
+                        details=f"Rule-set {rule_set}: " + "; ".join(commands)
+                    ))
+                    db.session.commit()
+                    flash(f"Rule set synchronized ({len(commands)} line(s) sent).")
+                else:
+                    flash("Rule set already matches, nothing sent.")
+                return redirect(url_for('diversion', device_id=device.id, rule_set=rule_set))
+        except ValueError as e:
+            flash(f"Error: {e}")
+            status = 400
+        except DeviceBusyError as e:
+            flash(f"Error: {e}")
+            status = 503
         except Exception as e:
             flash(f"Error: {e}")
+            status = 502
+
+    return render_template('diversion_sync.html', device=device, rule_set=rule_set, rules_csv=rules_csv,
+                           commands=commands), status
+
+@app.route('/routing')
+@login_required
+def routing():
+    """Where do these numbers go? Answered from the cached rules of every allowed gateway"""
+    if not current_user.can(Permissions.TASK_DIVERT):
+        flash("You do not have permission for this task on this device.")
+        return redirect(url_for('dashboard'))
+
+    devices = [d for d in Device.query.all() if current_user.can(d.permission_bit)]
+    rule_set = request.args.get('rule_set', DEFAULT_RULE_SET, type=int)
+    numbers = [n for n in re.split(r"[\s,;]+", request.args.get('numbers', '')) if n][:number_router.max_numbers]
+    # Rules as last read, however old: the page shows their age instead of reading the gateways
+    snapshots = {d.id: rule_cache.latest(d.id) for d in devices}
+    routes = number_router.route(devices, numbers, rule_set, snapshots)
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'rule_set': rule_set,
+            'routes': {number: [{
+                'device_id': route.device_id,
+                'device': route.device,
+                'rule_id': route.rule['id'] if route.rule else None,
+                'match': route.rule['raw_source'] if route.rule else None,
+                'result': route.result,
+                'age': route.age,
+            } for route in found] for number, found in routes.items()},
+        })
+    missing = [d for d in devices if snapshots[d.id] is None]
+    return render_template('routing.html', numbers=numbers, routes=routes, missing=missing, rule_set=rule_set)
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Status of a queued config change, polled by the diversion page"""
+    job = ConfigJob.query.get_or_404(job_id)
+    if not (current_user.can(Permissions.TASK_DIVERT) and current_user.can(job.device.permission_bit)):
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(job.to_dict())
+
+@app.route('/api/devices/<int:device_id>/rules')
+@login_required
+def api_device_rules(device_id):
+    """
+    Rules of one translation-rule set as JSON. The ETag is a hash of the
+    rule set, so clients polling with If-None-Match get a bodyless 304
+    until the configuration actually changes.
+    """
+    device = Device.query.get_or_404(device_id)
+    if not (current_user.can(Permissions.TASK_DIVERT) and current_user.can(device.permission_bit)):
+        return jsonify({'error': 'forbidden'}), 403
+
+    rule_set = request.args.get('rule_set', DEFAULT_RULE_SET, type=int)
+    try:
+        snapshot = CiscoVGDriver(device).get_snapshot(refresh=request.args.get('refresh') == '1', rule_set=rule_set)
+    except DeviceBusyError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 502
+
+    response = jsonify({
+        'device_id': device.id,
+        'device': device.name,
+        'rule_set': rule_set,
+        'rule_sets': sorted(snapshot.rule_sets),
+        'age': snapshot.age,
+        'rules': snapshot.get_rules(rule_set),
+    })
+    response.set_etag(snapshot.digest(rule_set))
+    # Clients must revalidate, but a matching ETag costs no body
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/diversion/<int:device_id>/save', methods=['POST'])
+@login_required
+def diversion_save(device_id):
+    """Force a pending deferred 'write memory' for a device"""
+    device = Device.query.get_or_404(device_id)
+    if not (current_user.can(Permissions.TASK_DIVERT) and current_user.can(device.permission_bit)):
+        flash("You do not have permission for this task on this device.")
+        return redirect(url_for('dashboard'))
 
-    # Load Current Config to display
     try:
-        rules = driver.get_diversions()
+        if save_scheduler.flush(device.id):
+            flash("Configuration saved.")
+        else:
+            flash("No unsaved changes.")
     except Exception as e:
-        flash(f"Could not connect to device: {e}")
-        rules = []
+        flash(f"Error: {e}")
 
-    return render_template('diversion.html', device=device, rules=rules)
+    return redirect(url_for('diversion', device_id=device.id, rule_set=request.form.get('rule_set', type=int)))
+
+@app.route('/fleet/diversion', methods=['GET', 'POST'])
+@login_required
+def fleet_diversion():
+    """Apply the same diversion on several gateways at once, streaming per-device results"""
+    if not current_user.can(Permissions.TASK_DIVERT):
+        flash("You do not have permission for this task on this device.")
+        return redirect(url_for('dashboard'))
+
+    devices = [d for d in Device.query.all() if current_user.can(d.permission_bit)]
+    if request.method == 'GET':
+        return render_template('fleet_diversion.html', devices=devices, default_rule_set=DEFAULT_RULE_SET)
+
+    selected = set(request.form.getlist('device_id', type=int))
+    source = request.form['source'].strip()
+    new_dest = request.form['new_dest'].strip()
+    rule_set = request.form.get('rule_set', DEFAULT_RULE_SET, type=int)
+    user_id = current_user.id
+    # Drivers are built here so worker threads never touch request-bound ORM objects
+    targets = [(d.name, CiscoVGDriver(d)) for d in devices if d.id in selected]
+
+    def push(driver):
+        started = time.monotonic()
+        with app.app_context():
+            try:
+                changes = driver.update_by_source(source, new_dest, rule_set)
+                status = 'ok' if changes else 'skipped'
+                message = f"{len(changes)} rule(s) updated" if changes else "No rule matches this source"
+            except Exception as e:
+                changes, status, message = [], 'error', str(e)
+        return {'status': status, 'message': message, 'changes': changes,
+                'elapsed': round(time.monotonic() - started, 2)}
+
+    def generate():
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=app.config.get('FLEET_PUSH_CONCURRENCY', 4)) as pool:
+            futures = {pool.submit(push, driver): name for name, driver in targets}
+            for future in as_completed(futures):
+                result = future.result()
+                result['device'] = futures[future]
+
+                # Log to DB, one entry per device and rule
+                for change in result.pop('changes'):
+                    db.session.add(AuditLog(
+                        user_id=user_id,
+                        device_name=result['device'],
+                        action="Fleet Diversion",
+                        details=f"Rule-set {rule_set} rule {change['rule_id']}: {change['raw_source']} -> {change['new_destination']}"
+                    ))
+                db.session.commit()
+
+                yield json.dumps(result) + "\n"
+
+        yield json.dumps({'done': True, 'elapsed': round(time.monotonic() - started, 2)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 # Admin decorator
 def admin_required(f):
@@ -175,6 +493,11 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def form_tristate(name):
+    """'1'/'0' form value as True/False; empty means 'automatic' (None)"""
+    value = request.form.get(name, '')
+    return None if value == '' else value == '1'
+
 # Admin Routes
 @app.route('/admin')
 @login_required
@@ -306,6 +629,12 @@ def admin_devices():
         password = request.form['password']
         enable_password = request.form['enable_password']
         permission_bit = int(request.form['permission_bit'])
+        poll_interval = request.form.get('poll_interval', type=int)
+        conn_timeout = request.form.get('conn_timeout', type=int)
+        read_timeout = request.form.get('read_timeout', type=int)
+        fast_cli = form_tristate('fast_cli')
+        delay_factor = request.form.get('delay_factor', type=float)
+        fetch_strategy = request.form.get('fetch_strategy') or None
 
         # Check if device exists
         if Device.query.filter_by(name=name).first():
@@ -319,7 +648,13 @@ def admin_devices():
                 username=username,
                 password=password,
                 enable_password=enable_password,
-                permission_bit=permission_bit
+                permission_bit=permission_bit,
+                poll_interval=poll_interval,
+                conn_timeout=conn_timeout,
+                read_timeout=read_timeout,
+                fast_cli=fast_cli,
+                delay_factor=delay_factor,
+                fetch_strategy=fetch_strategy
             )
             db.session.add(new_device)
             db.session.commit()
@@ -338,7 +673,9 @@ def admin_devices():
 
     devices = Device.query.all()
     permissions = Permissions.get_all_device_permissions()
-    return render_template('admin_devices.html', devices=devices, permissions=permissions, active_page='devices')
+    profiles = {device.id: timing_profiles.profile(device) for device in devices}
+    return render_template('admin_devices.html', devices=devices, permissions=permissions,
+                           timing_profiles=profiles, active_page='devices')
 
 @app.route('/admin/devices/<int:device_id>/edit', methods=['POST'])
 @login_required
@@ -354,9 +691,25 @@ def admin_edit_device(device_id):
     device.password = request.form['password']
     device.enable_password = request.form['enable_password']
     device.permission_bit = int(request.form['permission_bit'])
+    device.poll_interval = request.form.get('poll_interval', type=int)
+    device.conn_timeout = request.form.get('conn_timeout', type=int)
+    device.read_timeout = request.form.get('read_timeout', type=int)
+    device.fast_cli = form_tristate('fast_cli')
+    device.delay_factor = request.form.get('delay_factor', type=float)
+    fetch_strategy = request.form.get('fetch_strategy') or None
+    if fetch_strategy != device.fetch_strategy:
+        # Commands the gateway rejected under the old strategy get another chance
+        forget_unsupported(device.id)
+    device.fetch_strategy = fetch_strategy
 
     db.session.commit()
 
+    # Drop the pooled session, cached rules and breaker state so the next request uses the new settings
+    session_pool.discard(device.id)
+    rule_cache.invalidate(device.id)
+    device_breakers.reset(device.id)
+    timing_profiles.forget(device.id)
+
     # Log action
     log = AuditLog(
         user_id=current_user.id,
@@ -380,6 +733,12 @@ def admin_delete_device(device_id):
     db.session.delete(device)
     db.session.commit()
 
+    session_pool.discard(device_id)
+    rule_cache.invalidate(device_id)
+    device_breakers.reset(device_id)
+    timing_profiles.forget(device_id)
+    number_router.forget(device_id)
+
     # Log action
     log = AuditLog(
         user_id=current_user.id,
@@ -508,6 +867,14 @@ def admin_audit():
     logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).all()
     return render_template('admin_audit.html', logs=logs, active_page='audit')
 
+@app.route('/admin/timings')
+@login_required
+@admin_required
+def admin_timings():
+    """p50/p95/p99 of each device operation phase, from the in-memory span buffer"""
+    return render_template('admin_timings.html', rows=device_timings.summary(),
+                           span_count=len(device_timings.spans()), active_page='timings')
+
 @app.route('/admin/translations', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -529,6 +896,7 @@ def admin_translations():
             )
             db.session.add(new_translation)
             db.session.commit()
+            translation_service.bump_versions(language_code)
 
             # Log action
             log = AuditLog(
@@ -568,10 +936,12 @@ def admin_edit_translation(translation_id):
         return redirect(url_for('admin_translations'))
 
     # Update translation
+    old_language_code = translation.language_code
     translation.key = key
     translation.language_code = language_code
     translation.value = value
     db.session.commit()
+    translation_service.bump_versions(old_language_code, language_code)
 
     # Log action
     log = AuditLog(
@@ -596,6 +966,7 @@ def admin_delete_translation(translation_id):
     language_code = translation.language_code
     db.session.delete(translation)
     db.session.commit()
+    translation_service.bump_versions(language_code)
 
     # Log action
     log = AuditLog(
@@ -634,6 +1005,11 @@ def get_languages():
     } for lang in languages])
 
 if __name__ == '__main__':
+    # Bring an existing database up to date with the models (new tables and columns)
+    with app.app_context():
+        upgrade_schema()
+    config_poller.start()
+    job_queue.start()
     # Threaded=True is useful for handling multiple slow telnet connections
     # host='0.0.0.0' makes the server accessible from other machines on the network
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -1,8 +1,204 @@
+import csv
+import io
+import logging
 import re
-from netmiko import ConnectHandler
+import time
+from services.session_pool import session_pool
+from services.rule_cache import rule_cache
+from services.single_flight import SingleFlight
+from services.save_scheduler import save_scheduler
+from services.circuit_breaker import device_breakers
+from services.device_executor import device_executor, DeviceBusyError
+from services.device_timings import device_timings
+from services.timing_profiles import timing_profiles
+
+# We fetch a slightly broader section to ensure we get context,
+# but we will filter it strictly in Python.
+SHOW_TRANSLATION_RULES = "show run | section voice translation-rule"
+
+# Rule set shown when the caller does not pick one
+DEFAULT_RULE_SET = 2
+
+# Fetch strategies for reading one rule set (Device.fetch_strategy):
+#   full    - the whole translation-rule section, every rule set (default)
+#   section - 'show run | section' with an anchored regex: only the wanted rule set
+#   show    - 'show voice translation-rule N': only that rule set, without the running-config walk
+FETCH_FULL = 'full'
+FETCH_SECTION = 'section'
+FETCH_SHOW = 'show'
+# Also the fallback order when a gateway's IOS rejects a targeted command
+FETCH_STRATEGIES = (FETCH_SHOW, FETCH_SECTION, FETCH_FULL)
+
+_INVALID_COMMAND = re.compile(r"^\s*% (Invalid input|Incomplete command|Ambiguous command)", re.M)
+
+# (device_id, strategy) pairs a gateway rejected; not retried until restart
+# or until the device's fetch strategy is edited
+_unsupported = set()
+
+logger = logging.getLogger(__name__)
+
+# Concurrent reads of the same device share one telnet fetch
+_read_flight = SingleFlight()
+
+# rule 1 /^677250412/ /970202/ plan any unknown
+_RULE_PATTERN = re.compile(r"rule\s+(\d+)\s+/(.*?)/\s+/(.*?)/")
+_RULE_SET_PATTERN = re.compile(r"voice translation-rule\s+(\d+)$")
+
+def parse_translation_rules(output):
+    """
+    Single pass over 'show run | section voice translation-rule' output.
+    Returns {rule_set_number: [rule, ...]} with rules in config order.
+    """
+    rule_sets = {}
+    current = None
+
+    for line in output.splitlines():
+        line = line.strip()
+
+        # A new block starts: 'voice translation-rule 2'
+        match = _RULE_SET_PATTERN.match(line)
+        if match:
+            current = rule_sets.setdefault(int(match.group(1)), [])
+            continue
+
+        if not line:
+            continue
+
+        # End of a section (usually '!' or a global command)
+        if not line.startswith("rule"):
+            current = None
+            continue
+
+        if current is not None:
+            match = _RULE_PATTERN.search(line)
+            if match:
+                current.append({
+                    'id': match.group(1),
+                    'source': match.group(2).replace('^', ''),
+                    'destination': match.group(3),
+                    'raw_source': match.group(2)
+                })
+
+    return rule_sets
+
+# Translation-rule tag: 2
+#         Rule 1:
+#         Match pattern: ^677250412
+#         Replace pattern: 970202
+_SHOW_RULE_PATTERN = re.compile(r"Rule\s+(\d+):")
+_SHOW_MATCH_PATTERN = re.compile(r"Match pattern:\s*(\S*)")
+_SHOW_REPLACE_PATTERN = re.compile(r"Replace pattern:\s*(\S*)")
+
+def parse_show_translation_rule(output):
+    """Parses 'show voice translation-rule N' output into the rule list of that set."""
+    rules = []
+    current = None
+
+    for line in output.splitlines():
+        line = line.strip()
+
+        match = _SHOW_RULE_PATTERN.match(line)
+        if match:
+            current = {'id': match.group(1), 'source': '', 'destination': '', 'raw_source': ''}
+            rules.append(current)
+            continue
+
+        if current is None:
+            continue
+
+        match = _SHOW_MATCH_PATTERN.match(line)
+        if match:
+            current['raw_source'] = match.group(1)
+            current['source'] = match.group(1).replace('^', '')
+            continue
+
+        match = _SHOW_REPLACE_PATTERN.match(line)
+        if match:
+            current['destination'] = match.group(1)
+
+    return rules
+
+def fetch_command(strategy, rule_set=None):
+    """The show command a fetch strategy sends for rule_set"""
+    if strategy == FETCH_SHOW:
+        return f"show voice translation-rule {int(rule_set)}"
+    if strategy == FETCH_SECTION:
+        return f"show run | section ^voice translation-rule {int(rule_set)}$"
+    return SHOW_TRANSLATION_RULES
+
+def forget_unsupported(device_id):
+    """Let a device try every fetch strategy again (after its settings change)"""
+    # Snapshot first: device I/O threads add to the set while we iterate
+    for key in [key for key in tuple(_unsupported) if key[0] == device_id]:
+        _unsupported.discard(key)
+
+def rule_line(rule_id, raw_source, destination):
+    """The 'rule N /match/ /replace/' line written for a translation rule"""
+    # Security safety: Ensure values don't contain newlines/config injection
+    if any(c in str(value) for value in (raw_source, destination) for c in "\r\n"):
+        raise Exception("Invalid characters in source pattern")
+    return f"rule {rule_id} /{raw_source}/ /{destination}/ plan any unknown"
+
+def plan_rule_sync(live_rules, desired_rules):
+    """
+    Minimal lines turning the live rules of a rule set into desired_rules
+    (rule dicts with id, raw_source and destination): 'no rule N' for rules
+    that are gone, then 'rule N ...' for new or changed ones. Unchanged
+    rules produce nothing.
+    """
+    live = {int(rule['id']): rule for rule in live_rules}
+    desired = {int(rule['id']): rule for rule in desired_rules}
+
+    commands = [f"no rule {rule_id}" for rule_id in sorted(live) if rule_id not in desired]
+    for rule_id in sorted(desired):
+        rule = desired[rule_id]
+        current = live.get(rule_id)
+        if current is None or (current['raw_source'], current['destination']) != (rule['raw_source'], rule['destination']):
+            commands.append(rule_line(rule_id, rule['raw_source'], rule['destination']))
+    return commands
+
+def parse_rule_csv(text):
+    """
+    Parses a desired rule table: one 'rule,match,replace' row per rule,
+    e.g. '1,^677250412,970202'. The replace cell may be empty ('1,^0,'
+    strips the match). A 'rule,...' header row, blank lines and '#'
+    comments are skipped. Raises ValueError naming the first bad line, or
+    when the table has no rules at all (it would remove every live rule).
+    """
+    rules = []
+    seen = set()
+    for number, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        cells = [cell.strip() for cell in row]
+        if not any(cells) or cells[0].startswith('#'):
+            continue
+        if number == 1 and cells[0].lower() in ('rule', 'id'):
+            continue
+        if len(cells) != 3 or not all(cells[:2]):
+            raise ValueError(f"Line {number}: expected rule,match,replace")
+        rule_id, raw_source, destination = cells
+        if not rule_id.isdigit() or int(rule_id) < 1:
+            raise ValueError(f"Line {number}: invalid rule number '{rule_id}'")
+        if int(rule_id) in seen:
+            raise ValueError(f"Line {number}: rule {int(rule_id)} is listed twice")
+        if '/' in raw_source + destination:
+            raise ValueError(f"Line {number}: patterns cannot contain '/'")
+        seen.add(int(rule_id))
+        rules.append({
+            'id': str(int(rule_id)),
+            'source': raw_source.replace('^', ''),
+            'destination': destination,
+            'raw_source': raw_source
+        })
+    if not rules:
+        raise ValueError("The rule table is empty")
+    return rules
 
 class CiscoVGDriver:
     def __init__(self, device_db_obj):
+        # Sessions are pooled per Device.id
+        self.device_id = device_db_obj.id
+        # Tags the per-phase timing spans
+        self.name = device_db_obj.name
         self.device = {
             'device_type': 'cisco_ios_telnet',
             'host': device_db_obj.ip_address,
@@ -10,89 +206,244 @@ class CiscoVGDriver:
             'password': device_db_obj.password,
             'secret': device_db_obj.enable_password, 
             'port': device_db_obj.port,
-            'fast_cli': False, # Uncomment if older router is too slow/glitchy
         }
+        # fast_cli / delay factor / read timeout: learned per device, admin overrides win
+        self.device.update(timing_profiles.connection_params(device_db_obj))
+        # Per-device connect timeout; unset means netmiko's default
+        if device_db_obj.conn_timeout:
+            self.device['conn_timeout'] = device_db_obj.conn_timeout
+        # How single rule-set reads are fetched; full refreshes always read every set
+        self.fetch_strategy = device_db_obj.fetch_strategy if device_db_obj.fetch_strategy in FETCH_STRATEGIES else FETCH_FULL
 
-    def get_diversions(self):
+    def _run(self, operation):
         """
-        Robustly parses configuration to find ONLY 'voice translation-rule 2'.
-        It ignores 'voice translation-rule 255' or others.
+        Runs operation(net_connect) on the pooled session, behind the
+        device's circuit breaker so an unreachable gateway fails fast.
+        The work itself runs on the device I/O pool; the calling (request)
+        thread only waits for the result.
         """
+        # An open breaker fails here, without waiting for a pool slot
+        device_breakers.check(self.device_id)
+        try:
+            return device_executor.run(lambda: device_breakers.record(
+                self.device_id,
+                lambda: session_pool.run(self.device_id, self.device, operation, name=self.name)
+            ))
+        except DeviceBusyError:
+            # Never ran: if this call was the half-open probe, the next one probes instead
+            device_breakers.abandon(self.device_id)
+            raise
+        finally:
+            # Profiles learned on the worker thread are stored from the caller's app context
+            timing_profiles.save_pending()
+
+    def _send_command(self, net_connect, command):
+        started = time.perf_counter()
         try:
-            with ConnectHandler(**self.device) as net_connect:
-                net_connect.enable()
-                # We fetch a slightly broader section to ensure we get context,
-                # but we will filter it strictly in Python.
-                output = net_connect.send_command("show run | section voice translation-rule")
-                
-            rules = []
-            
-            # --- State Machine Parsing ---
-            in_target_block = False
-            
-            # Regex to parse the specific rule line:
-            # rule 1 /^677250412/ /970202/ plan any unknown
-            rule_pattern = re.compile(r"rule\s+(\d+)\s+/(.*?)/\s+/(.*?)/")
-
-            for line in output.splitlines():
-                line = line.strip()
-
-                # 1. Check if we are entering the specific block we want
-                if line == "voice translation-rule 2":
-                    in_target_block = True
-                    continue # Move to next line
-
-                # 2. Check if we are hitting a different block (e.g., rule 255)
-                # If we see any other "voice translation-rule X", stop capturing
-                if line.startswith("voice translation-rule") and line != "voice translation-rule 2":
-                    in_target_block = False
-                    continue
-
-                # 3. Check for the end of a section (usually '!' or a global command)
-                if line.startswith("!"):
-                    in_target_block = False
-                    continue
-
-                # 4. If we are inside the correct block, parse the rules
-                if in_target_block and line.startswith("rule"):
-                    match = rule_pattern.search(line)
-                    if match:
-                        rules.append({
-                            'id': match.group(1),
-                            'source': match.group(2).replace('^', ''), 
-                            'destination': match.group(3),
-                            'raw_source': match.group(2) 
-                        })
-            
-            return rules
+            with device_timings.span(self.name, 'send_command'):
+                output = net_connect.send_command(command)
+        except Exception:
+            timing_profiles.record_failure(self.device_id)
+            raise
+        # Command round trips drive the device's learned timing profile
+        timing_profiles.observe(self.device_id, time.perf_counter() - started)
+        return output
+
+    def _strategies(self, rule_set):
+        """Fetch strategies to try for rule_set, preferred first, ending with the full section"""
+        if rule_set is None:
+            return [FETCH_FULL]
+        chain = FETCH_STRATEGIES[FETCH_STRATEGIES.index(self.fetch_strategy):]
+        return [strategy for strategy in chain
+                if strategy == FETCH_FULL or (self.device_id, strategy) not in _unsupported]
+
+    def _read_rules(self, net_connect, rule_set=None):
+        """
+        Sends the fetch command on an open session, falling back to the next
+        strategy when the gateway rejects one. Returns (strategy, output).
+        """
+        for strategy in self._strategies(rule_set):
+            output = self._send_command(net_connect, fetch_command(strategy, rule_set))
+            if strategy != FETCH_FULL and _INVALID_COMMAND.search(output):
+                logger.warning(f"'{fetch_command(strategy, rule_set)}' not supported by {self.name}, falling back")
+                _unsupported.add((self.device_id, strategy))
+                continue
+            return strategy, output
 
+    def _parse(self, strategy, output, rule_set=None):
+        """Parses fetched output into {rule_set_number: [rule, ...]}"""
+        with device_timings.span(self.name, 'parse'):
+            if strategy == FETCH_FULL:
+                return parse_translation_rules(output)
+            if strategy == FETCH_SHOW:
+                return {int(rule_set): parse_show_translation_rule(output)}
+            return {int(rule_set): parse_translation_rules(output).get(int(rule_set), [])}
+
+    def _store(self, strategy, rule_sets):
+        """Caches parsed rule sets; a targeted read is merged into a still-fresh snapshot"""
+        if strategy != FETCH_FULL:
+            cached = rule_cache.latest(self.device_id)
+            # The merged snapshot gets a new read time, so older rule sets must not be carried
+            # into it: they would look fresh and never be read again
+            if cached is not None and cached.age <= rule_cache.ttl:
+                rule_sets = {**cached.rule_sets, **rule_sets}
+        return rule_cache.put(self.device_id, rule_sets)
+
+    def cached_snapshot(self, rule_set=None):
+        """The cached RuleSnapshot if it can answer for rule_set without a device read, else None"""
+        snapshot = rule_cache.get(self.device_id)
+        if snapshot is None:
+            return None
+        # A targeted read may have cached other rule sets only
+        if rule_set is not None and self.fetch_strategy != FETCH_FULL and int(rule_set) not in snapshot.rule_sets:
+            return None
+        return snapshot
+
+    def get_snapshot(self, refresh=False, rule_set=None):
+        """
+        Returns the cached RuleSnapshot for this device, reading the gateway
+        only when the snapshot is missing, expired or refresh is set.
+        With rule_set and a targeted fetch strategy only that rule set is
+        read (and merged into the snapshot); otherwise every set is.
+        """
+        if not refresh:
+            snapshot = self.cached_snapshot(rule_set)
+            if snapshot is not None:
+                return snapshot
+        if rule_set is None or self.fetch_strategy == FETCH_FULL:
+            return _read_flight.do(self.device_id, lambda: self._fetch_rule_sets())
+        return _read_flight.do((self.device_id, int(rule_set)), lambda: self._fetch_rule_sets(rule_set))
+
+    def get_diversions(self, rule_set=DEFAULT_RULE_SET, refresh=False):
+        """Returns the parsed rules of one rule set, served from the snapshot cache when fresh."""
+        return self.get_snapshot(refresh, rule_set=rule_set).get_rules(rule_set)
+
+    def _fetch_rule_sets(self, rule_set=None):
+        """Reads translation rules from the gateway and caches them; returns the RuleSnapshot."""
+        try:
+            strategy, output = self._run(lambda net_connect: self._read_rules(net_connect, rule_set))
+            return self._store(strategy, self._parse(strategy, output, rule_set))
+
+        except DeviceBusyError:
+            # Not a device problem: let callers answer 'busy, retry' as is
+            raise
         except Exception as e:
             # Log the error to console for debugging
             print(f"Driver Error: {e}")
             raise Exception(f"Connection Error: {str(e)}")
 
-    def update_diversion(self, rule_id, raw_source, new_destination):
+    def update_diversion(self, rule_id, raw_source, new_destination, rule_set=DEFAULT_RULE_SET):
+        """
+        Executes the config change sequence for a single rule.
+        Returns the post-change RuleSnapshot (see update_diversions).
+        """
+        return self.update_diversions([{
+            'rule_id': rule_id,
+            'raw_source': raw_source,
+            'new_destination': new_destination,
+        }], rule_set)
+
+    def update_by_source(self, source, new_destination, rule_set=DEFAULT_RULE_SET):
+        """
+        Points every rule whose source matches (raw pattern or display form)
+        at new_destination. Rule ids are looked up on a fresh read so a stale
+        snapshot can never overwrite the wrong rule.
+        Returns the list of changes applied (empty if no rule matched).
+        """
+        rules = self.get_diversions(rule_set, refresh=True)
+        changes = [{
+            'rule_id': rule['id'],
+            'raw_source': rule['raw_source'],
+            'new_destination': new_destination,
+        } for rule in rules if source in (rule['raw_source'], rule['source'])]
+
+        if changes:
+            self.update_diversions(changes, rule_set)
+        return changes
+
+    def update_diversions(self, changes, rule_set=DEFAULT_RULE_SET):
+        """
+        Applies several rule changes in one config session and saves once
+        (or hands the save to the deferred save scheduler when it is enabled).
+        changes is a list of dicts with rule_id, raw_source and new_destination.
+        Re-reads the rule section on the same session before it is released
+        and returns the post-change RuleSnapshot, so redrawing the page
+        costs no second connection.
+        """
+        lines = [rule_line(change['rule_id'], change['raw_source'], change['new_destination']) for change in changes]
+        deferred_save = save_scheduler.enabled
+
+        def apply_change(net_connect):
+            return self._configure(net_connect, rule_set, lines, deferred_save)
+
+        try:
+            strategy, output = self._run(apply_change)
+        except DeviceBusyError:
+            # Nothing was sent to the device
+            raise
+        except Exception as e:
+            # The device state is unknown now; force the next read to go live
+            rule_cache.invalidate(self.device_id)
+            raise Exception(f"Configuration Error: {str(e)}")
+
+        if deferred_save:
+            save_scheduler.schedule(self.device_id, self.save_config)
+
+        return self._store(strategy, self._parse(strategy, output, rule_set))
+
+    def sync_diversions(self, desired_rules, rule_set=DEFAULT_RULE_SET, dry_run=False):
         """
-        Executes the config change sequence.
+        Makes a rule set match desired_rules (see parse_rule_csv) with the
+        fewest lines: the live rules are read, diffed (plan_rule_sync) and
+        changed on one session, with one save, so nothing can slip in
+        between. Returns the lines sent, or with dry_run the lines that
+        would be sent.
         """
-        # Security safety: Ensure raw_source doesn't contain newlines/config injection
-        if "\n" in raw_source or "\r" in raw_source:
-            raise Exception("Invalid characters in source pattern")
-
-        command_line = f"rule {rule_id} /{raw_source}/ /{new_destination}/ plan any unknown"
-        
-        config_set = [
-            "voice translation-rule 2",
-            command_line,
-            "exit",
-            "exit"
-        ]
-        
+        if not desired_rules:
+            # Never empty a rule set by accident (e.g. a blank upload)
+            raise ValueError("The rule table is empty")
+        deferred_save = save_scheduler.enabled
+
+        def sync(net_connect):
+            strategy, output = self._read_rules(net_connect, rule_set)
+            live_rules = self._parse(strategy, output, rule_set).get(int(rule_set), [])
+            commands = plan_rule_sync(live_rules, desired_rules)
+            if commands and not dry_run:
+                strategy, output = self._configure(net_connect, rule_set, commands, deferred_save)
+            return commands, strategy, output
+
+        try:
+            commands, strategy, output = self._run(sync)
+        except DeviceBusyError:
+            raise
+        except Exception as e:
+            rule_cache.invalidate(self.device_id)
+            raise Exception(f"Configuration Error: {str(e)}")
+
+        if commands and not dry_run and deferred_save:
+            save_scheduler.schedule(self.device_id, self.save_config)
+
+        self._store(strategy, self._parse(strategy, output, rule_set))
+        return commands
+
+    def _configure(self, net_connect, rule_set, lines, deferred_save):
+        """Sends rule lines to a rule set, saves unless deferred and re-reads the rule set"""
+        config_set = [f"voice translation-rule {int(rule_set)}", *lines, "exit", "exit"]
+        with device_timings.span(self.name, 'send_config'):
+            net_connect.send_config_set(config_set)
+        if not deferred_save:
+            self._save_config(net_connect)
+        return self._read_rules(net_connect, rule_set)
+
+    def _save_config(self, net_connect):
+        with device_timings.span(self.name, 'save_config'):
+            return net_connect.save_config()
+
+    def save_config(self):
+        """Writes running-config to NVRAM ('write memory')."""
         try:
-            with ConnectHandler(**self.device) as net_connect:
-                net_connect.enable()
-                output = net_connect.send_config_set(config_set)
-                net_connect.save_config()
-            return output
+            return self._run(lambda net_connect: self._save_config(net_connect))
+        except DeviceBusyError:
+            raise
         except Exception as e:
-            raise Exception(f"Configuration Error: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Save Error: {str(e)}")
@@ -6,6 +6,74 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Device session pool: keep telnet sessions warm between requests
+    DEVICE_SESSION_POOL_ENABLED = True
+    DEVICE_SESSION_IDLE_TIMEOUT = 300   # seconds an unused session stays open
+    DEVICE_SESSION_REAP_INTERVAL = 30   # seconds between idle-session sweeps
+
+    # Device I/O pool: telnet work runs here, not on Waitress request threads
+    DEVICE_IO_WORKERS = 4       # concurrent device operations
+    DEVICE_IO_MAX_QUEUE = 16    # queued operations before requests get 'busy, retry'
+    DEVICE_IO_TIMEOUT = 60      # seconds a request waits for a device operation
+
+    # Gateways changed at the same time by a fleet-wide diversion push
+    FLEET_PUSH_CONCURRENCY = 4
+
+    # Waitress request threads (service_wrapper.py)
+    WAITRESS_THREADS = 4
+
+    # Circuit breaker: after N consecutive failures a device fails fast for the cool-down,
+    # then a single probe decides whether it is reachable again
+    DEVICE_BREAKER_FAILURES = 3
+    DEVICE_BREAKER_COOLDOWN = 60
+
+    # Seconds a translation-rule read is served from cache before the gateway is queried again
+    RULE_CACHE_TTL = 60
+
+    # Deferred 'write memory': apply changes to running-config immediately and
+    # save once per device after a quiet period or a max-delay deadline
+    DEFERRED_SAVE_ENABLED = False
+    DEFERRED_SAVE_QUIET_PERIOD = 30   # seconds without changes before saving
+    DEFERRED_SAVE_MAX_DELAY = 120     # seconds after the first change the save is forced
+
+    # Background config poller: keeps ConfigSnapshot rows fresh so page views
+    # are served from SQLite; live reads are only used for writes and refreshes
+    CONFIG_POLL_ENABLED = True
+    CONFIG_POLL_INTERVAL = 300      # default seconds between polls (Device.poll_interval overrides)
+    CONFIG_POLL_JITTER = 0.1        # +/- fraction of the interval, so gateways are not hit together
+    CONFIG_POLL_WORKERS = 2         # devices polled at the same time
+    CONFIG_SNAPSHOT_MAX_AGE = 900   # older persisted snapshots trigger a live read
+
+    # Per-phase device timing spans (connect, login, enable, send_command,
+    # parse, save_config...) kept in memory for the admin Timings page
+    DEVICE_TIMING_ENABLED = True
+    DEVICE_TIMING_BUFFER = 5000     # most recent spans kept
+
+    # Adaptive netmiko timing: devices whose 'show' round trips average under
+    # the fast threshold switch to fast_cli, those above the slow threshold (or
+    # that time out) get a larger delay factor and read timeout. The admin
+    # device form can pin fast_cli / delay factor / read timeout per device.
+    TIMING_PROFILE_LEARNING = True
+    TIMING_FAST_THRESHOLD = 1.0     # seconds
+    TIMING_SLOW_THRESHOLD = 5.0     # seconds
+    TIMING_MIN_SAMPLES = 5          # round trips measured before switching profile
+
+    # Config change job queue: diversion POSTs return at once with a job id and
+    # a background worker applies changes one at a time per device (FIFO)
+    JOB_QUEUE_ENABLED = True
+    JOB_QUEUE_WORKERS = 2           # devices changed at the same time
+    JOB_QUEUE_POLL_INTERVAL = 2     # seconds between scans for queued jobs
+    JOB_QUEUE_BUSY_BACKOFF = 5      # seconds before retrying a job whose device pool was full
+    JOB_QUEUE_LEASE = 60            # seconds a running job stays claimed without a heartbeat
+
+    # Translation catalogs are cached per process; each process checks the
+    # catalog versions in the database at most this often and reloads the
+    # languages edited elsewhere
+    TRANSLATION_VERSION_CHECK_INTERVAL = 5  # seconds
+
+    # Number routing simulator: numbers answered per lookup from the cached rules
+    ROUTING_MAX_NUMBERS = 1000
+
 # Bitwise Permission Constants
 class Permissions:
     NONE = 0
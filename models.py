@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 from config import Permissions
 
 db = SQLAlchemy()
@@ -34,6 +36,18 @@ class Device(db.Model):
     enable_password = db.Column(db.String(50))
     # Map this device to a Permission bit
     permission_bit = db.Column(db.Integer, default=0)
+    # Seconds between background config polls; None uses CONFIG_POLL_INTERVAL
+    poll_interval = db.Column(db.Integer)
+    # Connect/login and per-command read timeouts in seconds; None uses netmiko's defaults
+    conn_timeout = db.Column(db.Integer)
+    read_timeout = db.Column(db.Integer)
+    # Manual netmiko timing overrides; None lets the learned profile decide
+    fast_cli = db.Column(db.Boolean)
+    delay_factor = db.Column(db.Float)
+    # Timing profile learned from command round-trip times ('fast', 'standard' or 'slow')
+    timing_profile = db.Column(db.String(10))
+    # How single rule-set reads are fetched: 'full' (None), 'section' or 'show' (see cisco_driver)
+    fetch_strategy = db.Column(db.String(10))
 
 class Permission(db.Model):
     """Database model for managing permissions"""
@@ -53,6 +67,9 @@ class Language(db.Model):
     name = db.Column(db.String(50), nullable=False)              # 'English (US)', 'Italian (IT)'
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every write to this language's translations; app processes
+    # compare it to reload only the catalogs that changed
+    catalog_version = db.Column(db.Integer, default=0)
 
     def __repr__(self):
         return f'<Language {self.code} ({self.name})>'
@@ -79,3 +96,100 @@ class AuditLog(db.Model):
     device_name = db.Column(db.String(50))
     action = db.Column(db.String(50))
     details = db.Column(db.Text)
+
+class ConfigSnapshot(db.Model):
+    """Last translation-rule config read from a device (one row per device)"""
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('device.id'), unique=True, nullable=False)
+    fetched_at = db.Column(db.DateTime)
+    # JSON: {"<rule_set>": [{"id", "source", "destination", "raw_source"}, ...]}
+    rules_json = db.Column(db.Text)
+    last_attempt = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    # Set when the device was written since this read: never served in place of a live read
+    stale = db.Column(db.Boolean)
+
+    # Relationship
+    device = db.relationship('Device', backref=db.backref('config_snapshot', uselist=False,
+                                                          cascade='all, delete-orphan'))
+
+    def get_rule_sets(self):
+        """Parsed rules as {rule_set_number: [rule, ...]}"""
+        if not self.rules_json:
+            return {}
+        return {int(number): rules for number, rules in json.loads(self.rules_json).items()}
+
+    def set_rule_sets(self, rule_sets):
+        self.rules_json = json.dumps({str(number): rules for number, rules in rule_sets.items()})
+
+    def rule_count(self):
+        return sum(len(rules) for rules in self.get_rule_sets().values())
+
+    def __repr__(self):
+        return f'<ConfigSnapshot device={self.device_id} ({self.fetched_at})>'
+
+class ConfigJob(db.Model):
+    """Queued diversion change, applied by the background job worker in per-device FIFO order"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('device.id'), index=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    rule_set = db.Column(db.Integer, nullable=False)
+    # JSON list of {"rule_id", "raw_source", "new_destination"}
+    changes_json = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), default=QUEUED, index=True, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Device pool was busy: the job is not retried before this time
+    not_before = db.Column(db.DateTime)
+    # Worker process running the job, and until when its claim holds; the
+    # owner renews the lease while alive, so an expired lease means it died
+    owner = db.Column(db.String(80))
+    leased_until = db.Column(db.DateTime)
+
+    # Relationship
+    device = db.relationship('Device', backref=db.backref('config_jobs', cascade='all, delete-orphan'))
+
+    def get_changes(self):
+        return json.loads(self.changes_json)
+
+    def set_changes(self, changes):
+        self.changes_json = json.dumps(changes)
+
+    @property
+    def is_finished(self):
+        return self.status in (ConfigJob.DONE, ConfigJob.FAILED)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'device_id': self.device_id,
+            'rule_set': self.rule_set,
+            'changes': self.get_changes(),
+            'status': self.status,
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return f'<ConfigJob {self.id} device={self.device_id} ({self.status})>'
+
+def upgrade_schema():
+    """
+    Create missing tables and add columns introduced after a database was
+    first created. SQLite has no migrations here, so new columns must be nullable.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    for table in db.Model.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+    db.session.commit()
@@ -0,0 +1,167 @@
+"""
+Benchmark CiscoVGDriver against simulated gateways
+Starts one vg_simulator gateway per device and measures get_diversions()
+(live reads) and update_diversion() throughput and latency at rising
+concurrency, then prints the per-phase timing percentiles and compares
+bytes transferred and parse time of each rule fetch strategy.
+
+    python scripts/benchmark_driver.py --devices 8 --concurrency 1,2,4,8 --latency 0.02
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cisco_driver import CiscoVGDriver, FETCH_FULL, FETCH_SECTION, FETCH_SHOW
+from services.device_executor import device_executor
+from services.device_timings import device_timings, percentile
+from services.session_pool import session_pool
+from services.timing_profiles import timing_profiles
+from vg_simulator import VGSimulator
+
+
+def make_device(device_id, simulator):
+    """Device-shaped object pointing at a simulator (no database needed)"""
+    host, port = simulator.address
+    return SimpleNamespace(
+        id=device_id, name=f'SIM{device_id:02d}', ip_address=host, port=port,
+        username='cisco', password='cisco', enable_password='cisco',
+        conn_timeout=None, read_timeout=None,
+        fast_cli=None, delay_factor=None, timing_profile=None, fetch_strategy=None,
+    )
+
+
+def run_level(devices, concurrency, operations, operation):
+    """Run operations calls spread over the devices with concurrency threads"""
+    latencies = []
+    errors = 0
+
+    def call(index):
+        started = time.perf_counter()
+        # A driver per call, as in the web app, so learned timing profiles apply
+        driver = CiscoVGDriver(devices[index % len(devices)])
+        try:
+            operation(driver, index)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, error in pool.map(call, range(operations)):
+            latencies.append(elapsed * 1000)
+            if error is not None:
+                errors += 1
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'ops_per_sec': operations / wall,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'errors': errors,
+    }
+
+
+def read_rules(driver, index):
+    driver.get_diversions(refresh=True)
+
+
+def update_rule(driver, index):
+    rule_id = str(index % 5 + 1)
+    driver.update_diversion(rule_id, f'^6772504{int(rule_id):05d}', str(900000 + index))
+
+
+def compare_fetch_strategies(simulator, device, reads, rule_set):
+    """Bytes on the wire, read latency and parse time of each fetch strategy for one rule set"""
+    print(f"\n{'fetch strategy':<16}{'bytes/read':>12}{'read p50 ms':>13}{'parse p50 ms':>14}{'parse p95 ms':>14}")
+    for strategy in (FETCH_FULL, FETCH_SECTION, FETCH_SHOW):
+        device.fetch_strategy = strategy
+        # Log in first so the numbers only cover the reads themselves
+        CiscoVGDriver(device).get_diversions(rule_set, refresh=True)
+        device_timings.clear()
+        simulator.reset_stats()
+
+        latencies = []
+        for _ in range(reads):
+            started = time.perf_counter()
+            CiscoVGDriver(device).get_diversions(rule_set, refresh=True)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        parse = sorted(span.duration * 1000 for span in device_timings.spans() if span.phase == 'parse')
+        print(f"{strategy:<16}{simulator.stats['bytes_sent'] / reads:>12.0f}{percentile(latencies, 0.5):>13.0f}"
+              f"{percentile(parse, 0.5):>14.2f}{percentile(parse, 0.95):>14.2f}")
+    device.fetch_strategy = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CiscoVGDriver benchmark against simulated gateways")
+    parser.add_argument('--devices', type=int, default=8, help="simulated gateways")
+    parser.add_argument('--concurrency', default='1,2,4,8', help="comma-separated client thread counts")
+    parser.add_argument('--operations', type=int, default=40, help="calls per concurrency level")
+    parser.add_argument('--rules', type=int, default=50, help="rules per rule set")
+    parser.add_argument('--rule-sets', default='1,2,255')
+    parser.add_argument('--latency', type=float, default=0.01, help="simulated seconds per command")
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--io-workers', type=int, default=None, help="override DEVICE_IO_WORKERS")
+    parser.add_argument('--no-pool', action='store_true', help="connect per call (session pool disabled)")
+    parser.add_argument('--no-learning', action='store_true', help="keep the standard timing profile")
+    parser.add_argument('--fetch-reads', type=int, default=10, help="reads per fetch strategy (0 skips the comparison)")
+    parser.add_argument('--rule-set', type=int, default=2, help="rule set read by the fetch comparison")
+    args = parser.parse_args()
+
+    if args.io_workers:
+        device_executor.workers = args.io_workers
+    device_executor.max_queue = 1000
+    session_pool.enabled = not args.no_pool
+    timing_profiles.enabled = not args.no_learning
+
+    rule_sets = [int(n) for n in args.rule_sets.split(',')]
+    simulators = [
+        VGSimulator(rule_sets=rule_sets, rules_per_set=args.rules,
+                    latency=args.latency, fail_rate=args.fail_rate).start()
+        for _ in range(args.devices)
+    ]
+    devices = [make_device(i + 1, sim) for i, sim in enumerate(simulators)]
+
+    try:
+        # Warm up: log every device in once so levels compare steady-state sessions
+        warm = run_level(devices, len(devices), len(devices), read_rules)
+        print(f"Warm-up (login + first read): p50 {warm['p50']:.0f} ms, errors {warm['errors']}")
+        device_timings.clear()
+
+        print(f"\n{'operation':<18}{'threads':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, operation in (('get_diversions', read_rules), ('update_diversion', update_rule)):
+            for concurrency in (int(n) for n in args.concurrency.split(',')):
+                result = run_level(devices, concurrency, args.operations, operation)
+                print(f"{name:<18}{concurrency:>8}{result['ops_per_sec']:>10.1f}{result['p50']:>10.0f}"
+                      f"{result['p95']:>10.0f}{result['p99']:>10.0f}{result['errors']:>8}")
+
+        print(f"\n{'phase':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        phases = {}
+        for span in device_timings.spans():
+            phases.setdefault(span.phase, []).append(span.duration * 1000)
+        for phase, durations in sorted(phases.items()):
+            durations.sort()
+            print(f"{phase:<14}{len(durations):>8}{percentile(durations, 0.5):>10.1f}"
+                  f"{percentile(durations, 0.95):>10.1f}{percentile(durations, 0.99):>10.1f}")
+
+        sent = sum(sim.stats['bytes_sent'] for sim in simulators)
+        print(f"\nBytes sent by simulated gateways: {sent}")
+
+        if args.fetch_reads:
+            compare_fetch_strategies(simulators[0], devices[0], args.fetch_reads, args.rule_set)
+    finally:
+        session_pool.close_all()
+        device_executor.shutdown()
+        for simulator in simulators:
+            simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,15 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app, db
-from models import Language, Translation
+from models import Language, Translation, upgrade_schema
+from services.translation_service import translation_service
 
 def import_translations():
     """Import initial translations into the database"""
     with app.app_context():
+        # A database from before catalog versions lacks language.catalog_version
+        upgrade_schema()
+
         # English (US) Translations
         en_us_translations = {
             # Login Page
@@ -24,6 +28,55 @@ def import_translations():
             # Dashboard
             'dashboard.title': 'Select a Device',
             'dashboard.device_list': 'Device List',
+            'dashboard.last_read': 'Read {timestamp} UTC',
+            'dashboard.rule_count': '{count} rules',
+            'dashboard.poll_error': 'Last poll failed',
+            'dashboard.breaker_open': 'Unreachable, retry in {seconds}s',
+            'dashboard.breaker_probing': 'Reconnecting',
+
+            # Fleet Diversion
+            'fleet.title': 'Fleet Diversion',
+            'fleet.devices': 'Gateways',
+            'fleet.push_button': 'Apply to selected gateways',
+            'fleet.result': 'Result',
+            'fleet.elapsed': 'Elapsed',
+            'routing.title': 'Number routing',
+            'routing.numbers': 'Numbers (one per line)',
+            'routing.lookup': 'Look up',
+            'routing.number': 'Number',
+            'routing.rule': 'Matching rule',
+            'routing.result': 'Translated to',
+            'routing.age': 'Rules age',
+            'routing.no_match': 'No rule matches',
+            'routing.not_cached': 'No rules read yet from',
+            'sync.title': 'Sync from table',
+            'sync.help': 'One line per rule: rule,match,replace (e.g. 1,^677250412,970202; an empty replace strips the match). The rule set becomes exactly this table: rules not listed are removed, and only new or changed rules are sent to the gateway.',
+            'sync.file': 'CSV file',
+            'sync.table': 'Rule table',
+            'sync.preview': 'Preview commands',
+            'sync.apply': 'Apply to gateway',
+            'sync.commands': 'Commands to send: {count}',
+            'sync.no_changes': 'The rule set already matches this table.',
+            'jobs.title': 'Recent changes',
+            'jobs.status.queued': 'Queued',
+            'jobs.status.running': 'Running',
+            'jobs.status.done': 'Done',
+            'jobs.status.failed': 'Failed',
+            'admin.devices.fast_cli': 'Fast CLI',
+            'admin.devices.delay_factor': 'Delay factor',
+            'admin.devices.timing_profile': 'Learned timing profile',
+            'admin.devices.timing_auto': 'Auto (learned)',
+            'admin.devices.timing_on': 'On',
+            'admin.devices.timing_off': 'Off',
+            'admin.devices.fetch_strategy': 'Rule fetch',
+            'admin.devices.fetch_full': 'Full section (all rule sets)',
+            'admin.devices.fetch_section': 'Section of the selected rule set',
+            'admin.devices.fetch_show': 'show voice translation-rule N',
+            'admin.timings.title': 'Device Timings',
+            'admin.timings.phase': 'Phase',
+            'admin.timings.count': 'Samples',
+            'admin.timings.errors': 'Errors',
+            'admin.timings.buffer': 'Last {count} spans since the service started, in milliseconds',
 
             # Navigation
             'nav.brand': 'VG Manager',
@@ -42,6 +95,17 @@ def import_translations():
             'devices.permission_error': 'You do not have permission for this task on this device.',
             'devices.success': 'Configuration updated successfully!',
             'devices.error': 'Error: {error}',
+            'devices.snapshot_age': 'Read from device {seconds}s ago',
+            'devices.refresh': 'Refresh now',
+            'devices.bulk_edit': 'Bulk edit',
+            'devices.single_edit': 'Single edit',
+            'devices.bulk_update_button': 'Apply all changes',
+            'devices.save_pending': 'Unsaved changes: write memory in {seconds}s',
+            'devices.save_now': 'Save now',
+            'devices.rule_set': 'Rule set',
+            'devices.loading_rules': 'Reading rules from the gateway...',
+            'devices.load_error': 'Could not load the rules.',
+            'devices.retry': 'Retry',
 
             # Admin - Users
             'admin.users.title': 'User Management',
@@ -77,6 +141,9 @@ def import_translations():
             'admin.devices.password': 'Password',
             'admin.devices.enable_password': 'Enable Password',
             'admin.devices.permission_bit': 'Permission Bit',
+            'admin.devices.poll_interval': 'Poll Interval (seconds, blank = default)',
+            'admin.devices.conn_timeout': 'Connect Timeout (seconds)',
+            'admin.devices.read_timeout': 'Command Timeout (seconds)',
             'admin.devices.add_button': 'Add Device',
             'admin.devices.existing': 'Existing Devices',
             'admin.devices.edit_button': 'Edit',
@@ -152,6 +219,55 @@ def import_translations():
             # Dashboard
             'dashboard.title': 'Seleziona un Dispositivo',
             'dashboard.device_list': 'Lista Dispositivi',
+            'dashboard.last_read': 'Letto {timestamp} UTC',
+            'dashboard.rule_count': '{count} regole',
+            'dashboard.poll_error': 'Ultimo polling fallito',
+            'dashboard.breaker_open': 'Non raggiungibile, nuovo tentativo tra {seconds}s',
+            'dashboard.breaker_probing': 'Riconnessione',
+
+            # Fleet Diversion
+            'fleet.title': 'Deviazione Multipla',
+            'fleet.devices': 'Gateway',
+            'fleet.push_button': 'Applica ai gateway selezionati',
+            'fleet.result': 'Risultato',
+            'fleet.elapsed': 'Tempo',
+            'routing.title': 'Instradamento numeri',
+            'routing.numbers': 'Numeri (uno per riga)',
+            'routing.lookup': 'Cerca',
+            'routing.number': 'Numero',
+            'routing.rule': 'Regola applicata',
+            'routing.result': 'Tradotto in',
+            'routing.age': 'Età regole',
+            'routing.no_match': 'Nessuna regola corrisponde',
+            'routing.not_cached': 'Regole non ancora lette da',
+            'sync.title': 'Sincronizza da tabella',
+            'sync.help': 'Una riga per regola: regola,match,sostituzione (es. 1,^677250412,970202; una sostituzione vuota elimina il match). Il set di regole diventa esattamente questa tabella: le regole non elencate vengono rimosse e al gateway vengono inviate solo le regole nuove o modificate.',
+            'sync.file': 'File CSV',
+            'sync.table': 'Tabella delle regole',
+            'sync.preview': 'Anteprima comandi',
+            'sync.apply': 'Applica al gateway',
+            'sync.commands': 'Comandi da inviare: {count}',
+            'sync.no_changes': 'Il set di regole corrisponde già a questa tabella.',
+            'jobs.title': 'Modifiche recenti',
+            'jobs.status.queued': 'In coda',
+            'jobs.status.running': 'In corso',
+            'jobs.status.done': 'Completata',
+            'jobs.status.failed': 'Fallita',
+            'admin.devices.fast_cli': 'CLI veloce',
+            'admin.devices.delay_factor': 'Fattore di ritardo',
+            'admin.devices.timing_profile': 'Profilo di temporizzazione appreso',
+            'admin.devices.timing_auto': 'Automatico (appreso)',
+            'admin.devices.timing_on': 'Attivo',
+            'admin.devices.timing_off': 'Disattivo',
+            'admin.devices.fetch_strategy': 'Lettura regole',
+            'admin.devices.fetch_full': 'Sezione completa (tutti i set)',
+            'admin.devices.fetch_section': 'Sezione del set selezionato',
+            'admin.devices.fetch_show': 'show voice translation-rule N',
+            'admin.timings.title': 'Tempi dei dispositivi',
+            'admin.timings.phase': 'Fase',
+            'admin.timings.count': 'Campioni',
+            'admin.timings.errors': 'Errori',
+            'admin.timings.buffer': 'Ultimi {count} intervalli dall\'avvio del servizio, in millisecondi',
 
             # Navigation
             'nav.brand': 'Gestione VG',
@@ -170,6 +286,17 @@ def import_translations():
             'devices.permission_error': 'Non hai il permesso per questo compito su questo dispositivo.',
             'devices.success': 'Configurazione aggiornata con successo!',
             'devices.error': 'Errore: {error}',
+            'devices.snapshot_age': 'Letto dal dispositivo {seconds}s fa',
+            'devices.refresh': 'Aggiorna ora',
+            'devices.bulk_edit': 'Modifica multipla',
+            'devices.single_edit': 'Modifica singola',
+            'devices.bulk_update_button': 'Applica tutte le modifiche',
+            'devices.save_pending': 'Modifiche non salvate: write memory tra {seconds}s',
+            'devices.save_now': 'Salva ora',
+            'devices.rule_set': 'Set di regole',
+            'devices.loading_rules': 'Lettura delle regole dal gateway...',
+            'devices.load_error': 'Impossibile caricare le regole.',
+            'devices.retry': 'Riprova',
 
             # Admin - Users
             'admin.users.title': 'Gestione Utenti',
@@ -205,6 +332,9 @@ def import_translations():
             'admin.devices.password': 'Password',
             'admin.devices.enable_password': 'Password Abilitazione',
             'admin.devices.permission_bit': 'Bit Permesso',
+            'admin.devices.poll_interval': 'Intervallo Polling (secondi, vuoto = predefinito)',
+            'admin.devices.conn_timeout': 'Timeout Connessione (secondi)',
+            'admin.devices.read_timeout': 'Timeout Comandi (secondi)',
             'admin.devices.add_button': 'Aggiungi Dispositivo',
             'admin.devices.existing': 'Dispositivi Esistenti',
             'admin.devices.edit_button': 'Modifica',
@@ -296,6 +426,8 @@ def import_translations():
                 db.session.add(translation)
 
         db.session.commit()
+        # Running app processes reload these languages on their next version check
+        translation_service.bump_versions('en-US', 'it-IT')
         print(f"Successfully imported {len(en_us_translations)} English and {len(it_it_translations)} Italian translations!")
         return True
 
@@ -0,0 +1,379 @@
+"""
+Offline Cisco VG telnet simulator
+Emulates the parts of an IOS voice gateway CLI that CiscoVGDriver uses
+(login, enable, 'show run | section ...', 'show voice translation-rule N',
+config mode, the 'voice translation-rule' sub-mode and 'write memory'),
+with configurable latency, rule counts and failure injection, so the
+driver can be tested and benchmarked without a real gateway.
+
+    python scripts/vg_simulator.py --port 2323 --rules 200 --latency 0.05
+"""
+
+import argparse
+import random
+import re
+import socketserver
+import threading
+import time
+
+IAC = 255
+# WILL, WONT, DO, DONT carry an option byte after the command
+_NEGOTIATION = (251, 252, 253, 254)
+SB, SE = 250, 240
+
+USER_EXEC, PRIVILEGED, CONFIG, TRANSLATION_RULE = 'exec', 'priv', 'config', 'rule'
+
+INVALID_INPUT = "% Invalid input detected at '^' marker."
+
+_RULE_LINE = re.compile(r"rule\s+(\d+)\s+(/.*?/\s+/.*?/.*)$")
+_NO_RULE_LINE = re.compile(r"no\s+rule\s+(\d+)$")
+_RULE_SET_LINE = re.compile(r"voice translation-rule\s+(\d+)$")
+
+
+class GatewayState:
+    """Running config shared by every session to one simulated gateway"""
+
+    def __init__(self, rule_sets=(2,), rules_per_set=20):
+        self.lock = threading.Lock()
+        self.rule_sets = {}
+        self.saved = None
+        for number in rule_sets:
+            self.rule_sets[number] = {
+                rule_id: f"/^6772504{rule_id:05d}/ /97020{rule_id:05d}/"
+                for rule_id in range(1, rules_per_set + 1)
+            }
+        self.write_memory()
+
+    def section(self, pattern=r"voice translation-rule"):
+        """'show run | section <pattern>' output, limited to translation-rule blocks"""
+        with self.lock:
+            lines = []
+            for number in sorted(self.rule_sets):
+                header = f"voice translation-rule {number}"
+                if not re.search(pattern, header):
+                    continue
+                lines.append(header)
+                for rule_id in sorted(self.rule_sets[number]):
+                    lines.append(f" rule {rule_id} {self.rule_sets[number][rule_id]}")
+            return "\r\n".join(lines)
+
+    def show_translation_rule(self, number):
+        """'show voice translation-rule N' output"""
+        with self.lock:
+            rules = self.rule_sets.get(number)
+            if rules is None:
+                return f"<no rule set {number}>"
+            lines = [f"Translation-rule tag: {number}", ""]
+            for rule_id in sorted(rules):
+                match, replace = re.match(r"/(.*?)/\s+/(.*?)/", rules[rule_id]).groups()
+                lines += [
+                    f"        Rule {rule_id}:",
+                    f"        Match pattern: {match}",
+                    f"        Replace pattern: {replace}",
+                    "        Match type: none                Replace type: none",
+                    "        Match plan: none                Replace plan: none",
+                    "",
+                ]
+            return "\r\n".join(lines)
+
+    def set_rule(self, rule_set, rule_id, body):
+        with self.lock:
+            self.rule_sets.setdefault(rule_set, {})[rule_id] = body
+
+    def remove_rule(self, rule_set, rule_id):
+        with self.lock:
+            self.rule_sets.get(rule_set, {}).pop(rule_id, None)
+
+    def write_memory(self):
+        with self.lock:
+            self.saved = {number: dict(rules) for number, rules in self.rule_sets.items()}
+
+
+class SimulatorSettings:
+    def __init__(self, hostname='VG-SIM', username='cisco', password='cisco', secret='cisco',
+                 latency=0.0, jitter=0.0, login_latency=0.0, save_latency=0.0,
+                 fail_rate=0.0, reject_commands=(), auth_fail=False):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.secret = secret
+        self.latency = latency              # seconds before every command response
+        self.jitter = jitter                # +/- random seconds added to latency
+        self.login_latency = login_latency  # extra seconds before the first prompt
+        self.save_latency = save_latency    # extra seconds for 'write memory'
+        self.fail_rate = fail_rate          # probability a command drops the connection
+        self.reject_commands = tuple(reject_commands)  # prefixes answered with '% Invalid input'
+        self.auth_fail = auth_fail          # reject every login
+
+
+class _Session(socketserver.BaseRequestHandler):
+    """One telnet session: line-oriented, echoes input like a real VTY line"""
+
+    def setup(self):
+        self.settings = self.server.settings
+        self.state = self.server.gateway
+        self.mode = USER_EXEC
+        self.buffer = b''
+        self.pending_cr = False
+        self.closed = False
+
+    def handle(self):
+        stats = self.server.stats
+        with self.server.stats_lock:
+            stats['connections'] += 1
+        try:
+            time.sleep(self.settings.login_latency)
+            self.send("\r\nUser Access Verification\r\n\r\nUsername: ")
+            username = self.read_line()
+            self.send("Password: ")
+            password = self.read_line()
+            if (self.settings.auth_fail or username != self.settings.username
+                    or password != self.settings.password):
+                self.send("\r\n% Login invalid\r\n\r\n")
+                return
+            with self.server.stats_lock:
+                stats['logins'] += 1
+            self.send("\r\n" + self.prompt())
+
+            while not self.closed:
+                line = self.read_line()
+                if line is None:
+                    return
+                self.send(line + "\r\n")
+                self.delay()
+                if self.settings.fail_rate and random.random() < self.settings.fail_rate:
+                    with self.server.stats_lock:
+                        stats['dropped'] += 1
+                    return
+                with self.server.stats_lock:
+                    stats['commands'] += 1
+                output = self.execute(line.strip())
+                if self.closed:
+                    return
+                self.send((output + "\r\n" if output else "") + self.prompt())
+        except (ConnectionError, OSError):
+            pass
+
+    # --- I/O -----------------------------------------------------------
+
+    def send(self, text):
+        data = text.encode('ascii', 'replace')
+        self.request.sendall(data)
+        with self.server.stats_lock:
+            self.server.stats['bytes_sent'] += len(data)
+
+    def read_line(self):
+        """Next input line with telnet negotiation stripped; None on EOF"""
+        while True:
+            for index, byte in enumerate(self.buffer):
+                if byte in (13, 10):
+                    line, rest = self.buffer[:index], self.buffer[index + 1:]
+                    # '\r\n' and '\r\0' end a single line
+                    if byte == 13 and rest[:1] in (b'\n', b'\0'):
+                        rest = rest[1:]
+                    elif byte == 13 and not rest:
+                        self.pending_cr = True
+                    self.buffer = rest
+                    return line.decode('ascii', 'replace')
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return None
+            chunk = self._strip_negotiation(chunk)
+            if self.pending_cr and chunk[:1] in (b'\n', b'\0'):
+                chunk = chunk[1:]
+            self.pending_cr = False
+            self.buffer += chunk
+
+    def _strip_negotiation(self, data):
+        out = bytearray()
+        index = 0
+        while index < len(data):
+            byte = data[index]
+            if byte != IAC:
+                out.append(byte)
+                index += 1
+                continue
+            command = data[index + 1] if index + 1 < len(data) else None
+            if command in _NEGOTIATION:
+                index += 3
+            elif command == SB:
+                end = data.find(bytes([IAC, SE]), index)
+                index = len(data) if end < 0 else end + 2
+            else:
+                # IAC NOP (netmiko's is_alive probe), IAC IAC and the like
+                index += 2
+        return bytes(out)
+
+    def delay(self):
+        seconds = self.settings.latency
+        if self.settings.jitter:
+            seconds += random.uniform(-self.settings.jitter, self.settings.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    # --- CLI -----------------------------------------------------------
+
+    def prompt(self):
+        hostname = self.settings.hostname
+        return {
+            USER_EXEC: f"{hostname}>",
+            PRIVILEGED: f"{hostname}#",
+            CONFIG: f"{hostname}(config)#",
+            TRANSLATION_RULE: f"{hostname}(cfg-translation-rule)#",
+        }[self.mode]
+
+    def execute(self, command):
+        if not command:
+            return ""
+        if any(command.startswith(prefix) for prefix in self.settings.reject_commands):
+            return INVALID_INPUT
+
+        if self.mode in (CONFIG, TRANSLATION_RULE):
+            return self.execute_config(command)
+
+        if command in ('exit', 'logout', 'quit'):
+            self.closed = True
+            return ""
+        if command.startswith('terminal '):
+            return ""
+        if command == 'enable':
+            if self.mode == PRIVILEGED:
+                return ""
+            self.send("Password: ")
+            secret = self.read_line()
+            if secret != self.settings.secret:
+                return "% Access denied"
+            self.mode = PRIVILEGED
+            return ""
+        if self.mode != PRIVILEGED:
+            return INVALID_INPUT
+
+        if command == 'disable':
+            self.mode = USER_EXEC
+            return ""
+        if command in ('configure terminal', 'conf t'):
+            self.mode = CONFIG
+            return "Enter configuration commands, one per line.  End with CNTL/Z."
+        if command in ('write memory', 'write mem', 'wr', 'copy running-config startup-config'):
+            time.sleep(self.settings.save_latency)
+            self.state.write_memory()
+            return "Building configuration...\r\n[OK]"
+        match = re.match(r"show run(ning-config)? \| section (.+)$", command)
+        if match:
+            return self.state.section(match.group(2))
+        match = re.match(r"show voice translation-rule (\d+)$", command)
+        if match:
+            return self.state.show_translation_rule(int(match.group(1)))
+        return INVALID_INPUT
+
+    def execute_config(self, command):
+        if command == 'end':
+            self.mode = PRIVILEGED
+            return ""
+        if command == 'exit':
+            self.mode = CONFIG if self.mode == TRANSLATION_RULE else PRIVILEGED
+            return ""
+        match = _RULE_SET_LINE.match(command)
+        if match:
+            self.rule_set = int(match.group(1))
+            self.mode = TRANSLATION_RULE
+            return ""
+        if self.mode == TRANSLATION_RULE:
+            match = _RULE_LINE.match(command)
+            if match:
+                self.state.set_rule(self.rule_set, int(match.group(1)), match.group(2))
+                return ""
+            match = _NO_RULE_LINE.match(command)
+            if match:
+                self.state.remove_rule(self.rule_set, int(match.group(1)))
+                return ""
+        return INVALID_INPUT
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class VGSimulator:
+    """
+    One simulated gateway listening on host:port (port 0 picks a free port).
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, rule_sets=(2,), rules_per_set=20, **settings):
+        self.gateway = GatewayState(rule_sets, rules_per_set)
+        self.settings = SimulatorSettings(**settings)
+        self._server = _Server((host, port), _Session)
+        self._server.gateway = self.gateway
+        self._server.settings = self.settings
+        self._server.stats_lock = threading.Lock()
+        self.reset_stats()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    @property
+    def stats(self):
+        """connections, logins, commands, dropped and bytes_sent since the last reset"""
+        with self._server.stats_lock:
+            return dict(self._server.stats)
+
+    def reset_stats(self):
+        with self._server.stats_lock:
+            self._server.stats = {'connections': 0, 'logins': 0, 'commands': 0, 'dropped': 0, 'bytes_sent': 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='vg-simulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Cisco VG telnet simulator")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2323)
+    parser.add_argument('--rule-sets', default='2', help="comma-separated rule-set numbers")
+    parser.add_argument('--rules', type=int, default=20, help="rules per rule set")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before each response")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--login-latency', type=float, default=0.0)
+    parser.add_argument('--save-latency', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="probability a command drops the session")
+    parser.add_argument('--reject', action='append', default=[], help="command prefix to answer with '%% Invalid input'")
+    parser.add_argument('--auth-fail', action='store_true')
+    args = parser.parse_args()
+
+    simulator = VGSimulator(
+        host=args.host, port=args.port,
+        rule_sets=[int(n) for n in args.rule_sets.split(',')], rules_per_set=args.rules,
+        latency=args.latency, jitter=args.jitter, login_latency=args.login_latency,
+        save_latency=args.save_latency, fail_rate=args.fail_rate,
+        reject_commands=args.reject, auth_fail=args.auth_fail,
+    )
+    host, port = simulator.address
+    print(f"Simulated gateway listening on {host}:{port} (username/password/secret: cisco)")
+    simulator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -72,6 +72,13 @@ class FlaskService(win32serviceutil.ServiceFramework):
     def SvcStop(self):
         log("Service stopping...")
         self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
+        # Write any deferred config changes to NVRAM before the process goes away
+        try:
+            from services.save_scheduler import save_scheduler
+            save_scheduler.flush_all()
+            log("Pending device saves flushed.")
+        except Exception as e:
+            log(f"Failed to flush pending device saves: {e}")
         win32event.SetEvent(self.hWaitStop)
         log("Service stop signal sent.")
 
@@ -105,17 +112,27 @@ class FlaskService(win32serviceutil.ServiceFramework):
             # Initialize database if needed
             log("Initializing database...")
             with app.app_context():
-                from models import db
-                db.create_all()
+                from models import upgrade_schema
+                upgrade_schema()
             log("Database initialized.")
 
+            # Start background config poller
+            from services.config_poller import config_poller
+            config_poller.start()
+            log("Config poller started.")
+
+            # Start config change job worker (also resumes jobs left by a previous run)
+            from services.job_queue import job_queue
+            job_queue.start()
+            log("Job queue started.")
+
             # Start Waitress server
             log("Starting Waitress server on port 5000...")
             serve(
                 app,
                 host='0.0.0.0',
                 port=5000,
-                threads=4,
+                threads=app.config.get('WAITRESS_THREADS', 4),
                 url_scheme='http'
             )
             log("Waitress server exited.")
@@ -0,0 +1,132 @@
+"""
+Device Circuit Breaker
+Fails fast for gateways that keep failing, instead of tying up a request
+thread until netmiko's connect/auth timeouts expire
+"""
+
+import threading
+import logging
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a device whose breaker is open"""
+
+
+class _Breaker:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, app=None):
+        self.app = app
+        self.failure_threshold = 3
+        self.cooldown = 60
+        self.logger = logging.getLogger(__name__)
+        self._breakers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the circuit breakers with Flask app"""
+        self.app = app
+        self.failure_threshold = app.config.get('DEVICE_BREAKER_FAILURES', 3)
+        self.cooldown = app.config.get('DEVICE_BREAKER_COOLDOWN', 60)
+
+    def call(self, device_id, fn):
+        """
+        Run fn() unless the device's breaker is open.
+        After the cool-down a single half-open probe is let through; its
+        outcome closes the breaker or opens it for another cool-down.
+        """
+        self.check(device_id)
+        return self.record(device_id, fn)
+
+    def check(self, device_id):
+        """
+        Raise CircuitOpenError if the device's breaker is open. Callers that
+        hand the work to another thread check here first, so they fail fast,
+        and run it there through record(). A caller let through as the
+        half-open probe that then never runs it must call abandon().
+        """
+        with self._lock:
+            breaker = self._breakers.get(device_id)
+            if breaker is None or breaker.state == CLOSED:
+                return
+            if breaker.state == OPEN:
+                remaining = breaker.opened_at + self.cooldown - time.monotonic()
+                if remaining <= 0:
+                    # This caller becomes the probe; everyone else keeps failing fast
+                    breaker.state = HALF_OPEN
+                    return
+                raise CircuitOpenError(
+                    f"Device unreachable ({breaker.last_error}), retry in {int(remaining) + 1}s"
+                )
+            raise CircuitOpenError("Device unreachable, reconnect attempt in progress")
+
+    def record(self, device_id, fn):
+        """Run fn() and count its outcome, without the open check (see check)"""
+        try:
+            result = fn()
+        except Exception as e:
+            self._record_failure(device_id, e)
+            raise
+        self._record_success(device_id)
+        return result
+
+    def abandon(self, device_id):
+        """The half-open probe let through by check() never ran: let the next caller probe"""
+        with self._lock:
+            breaker = self._breakers.get(device_id)
+            if breaker is not None and breaker.state == HALF_OPEN:
+                breaker.state = OPEN
+
+    def state(self, device_id):
+        """Breaker status for display: state, failures, retry_in seconds and last error"""
+        with self._lock:
+            breaker = self._breakers.get(device_id)
+            if breaker is None:
+                return {'state': CLOSED, 'failures': 0, 'retry_in': 0, 'last_error': None}
+            retry_in = 0
+            if breaker.state == OPEN:
+                retry_in = max(0, int(breaker.opened_at + self.cooldown - time.monotonic()))
+            return {
+                'state': breaker.state,
+                'failures': breaker.failures,
+                'retry_in': retry_in,
+                'last_error': breaker.last_error,
+            }
+
+    def reset(self, device_id):
+        with self._lock:
+            self._breakers.pop(device_id, None)
+
+    def _record_success(self, device_id):
+        with self._lock:
+            breaker = self._breakers.pop(device_id, None)
+        if breaker is not None and breaker.state != CLOSED:
+            self.logger.info(f"Circuit for device {device_id} closed")
+
+    def _record_failure(self, device_id, error):
+        with self._lock:
+            breaker = self._breakers.setdefault(device_id, _Breaker())
+            breaker.failures += 1
+            breaker.last_error = str(error)
+            if breaker.state == HALF_OPEN or breaker.failures >= self.failure_threshold:
+                if breaker.state != OPEN:
+                    self.logger.warning(f"Circuit for device {device_id} opened: {error}")
+                breaker.state = OPEN
+                breaker.opened_at = time.monotonic()
+
+
+# Create instance
+device_breakers = CircuitBreakerRegistry()
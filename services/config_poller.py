@@ -0,0 +1,113 @@
+"""
+Background Config Poller
+Periodically reads translation-rule config from every device with bounded
+concurrency, so page views are served from the persisted snapshots
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from models import db, Device, ConfigSnapshot
+from cisco_driver import CiscoVGDriver
+import threading
+import logging
+import random
+import time
+
+
+class ConfigPoller:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = False
+        self.interval = 300
+        self.jitter = 0.1
+        self.workers = 2
+        self.tick = 5
+        self.logger = logging.getLogger(__name__)
+        self._next_due = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the config poller with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('CONFIG_POLL_ENABLED', False)
+        self.interval = app.config.get('CONFIG_POLL_INTERVAL', 300)
+        self.jitter = app.config.get('CONFIG_POLL_JITTER', 0.1)
+        self.workers = app.config.get('CONFIG_POLL_WORKERS', 2)
+
+    def start(self):
+        """Start the scheduler thread (no-op when disabled or already running)"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='config-poll')
+        self._thread = threading.Thread(target=self._run, name='config-poller', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Config poller started ({self.workers} workers, {self.interval}s interval)")
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def poll_device(self, device_id):
+        """Read one device live and persist the result (or the error)"""
+        try:
+            with self.app.app_context():
+                device = Device.query.get(device_id)
+                if device is None:
+                    return
+                try:
+                    # The driver persists successful reads through the rule cache
+                    CiscoVGDriver(device).get_snapshot(refresh=True)
+                except Exception as e:
+                    self.logger.warning(f"Config poll of {device.name} failed: {e}")
+                    self._record_error(device_id, str(e))
+        finally:
+            with self._lock:
+                self._in_flight.discard(device_id)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self._schedule_due()
+            except Exception as e:
+                self.logger.warning(f"Config poller error: {e}")
+
+    def _schedule_due(self):
+        with self.app.app_context():
+            devices = [(d.id, d.poll_interval or self.interval) for d in Device.query.all()]
+
+        now = time.monotonic()
+        for device_id, interval in devices:
+            next_due = self._next_due.get(device_id)
+            if next_due is None:
+                # Spread the first round over one interval so gateways are not all hit at once
+                self._next_due[device_id] = now + random.uniform(0, interval)
+                continue
+            if next_due > now:
+                continue
+            with self._lock:
+                if device_id in self._in_flight:
+                    continue
+                self._in_flight.add(device_id)
+            self._next_due[device_id] = now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._executor.submit(self.poll_device, device_id)
+
+    def _record_error(self, device_id, error):
+        row = ConfigSnapshot.query.filter_by(device_id=device_id).first()
+        if row is None:
+            row = ConfigSnapshot(device_id=device_id)
+            db.session.add(row)
+        row.last_attempt = datetime.utcnow()
+        row.last_error = error
+        db.session.commit()
+
+
+# Create instance
+config_poller = ConfigPoller()
@@ -0,0 +1,92 @@
+"""
+Device I/O Executor
+Runs blocking telnet work on its own bounded worker pool so request
+threads only wait on futures, and a saturated pool answers 'busy'
+immediately instead of queueing requests behind slow gateways
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import logging
+
+
+class DeviceBusyError(Exception):
+    """Raised when the device worker pool and its queue are full"""
+
+
+class DeviceTimeoutError(Exception):
+    """Raised when a caller gave up waiting for a device operation"""
+
+
+class DeviceExecutor:
+    def __init__(self, app=None):
+        self.app = app
+        self.workers = 4
+        self.max_queue = 16
+        self.timeout = 60
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._active = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the device executor with Flask app"""
+        self.app = app
+        self.workers = app.config.get('DEVICE_IO_WORKERS', 4)
+        self.max_queue = app.config.get('DEVICE_IO_MAX_QUEUE', 16)
+        self.timeout = app.config.get('DEVICE_IO_TIMEOUT', 60)
+        self.shutdown()
+
+    def submit(self, fn):
+        """Queue fn() on the device pool; raises DeviceBusyError when the queue is full"""
+        with self._lock:
+            # Running plus queued operations are capped at workers + max_queue
+            if self._active >= self.workers + self.max_queue:
+                raise DeviceBusyError("All device workers are busy, please retry in a few seconds")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='device-io')
+            self._active += 1
+            executor = self._executor
+        try:
+            future = executor.submit(fn)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def run(self, fn, timeout=None):
+        """Run fn() on the device pool and wait for its result"""
+        try:
+            future = self.submit(fn)
+        except RuntimeError:
+            # The interpreter is exiting and concurrent.futures refuses new work before
+            # atexit handlers run (e.g. the deferred-save flush): run it on this thread
+            self.logger.info("Device pool shut down, running operation on the calling thread")
+            return fn()
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            # The worker keeps running until netmiko's own timeouts fire; we just stop waiting
+            raise DeviceTimeoutError(f"Device operation did not finish within {timeout or self.timeout}s")
+
+    def pending(self):
+        """Operations running or queued right now"""
+        with self._lock:
+            return self._active
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+
+
+# Create instance
+device_executor = DeviceExecutor()
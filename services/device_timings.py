@@ -0,0 +1,96 @@
+"""
+Device Timing Spans
+Records how long each phase of a device operation took (connect, login,
+enable, send_command, parse, save_config...) in a fixed-size in-memory
+ring buffer, and summarizes them as p50/p95/p99 per device and phase
+"""
+
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import threading
+import math
+import time
+
+OK = 'ok'
+ERROR = 'error'
+
+Span = namedtuple('Span', 'timestamp device phase duration outcome')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class DeviceTimings:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = True
+        self._spans = deque(maxlen=5000)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the timing buffer with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('DEVICE_TIMING_ENABLED', True)
+        with self._lock:
+            self._spans = deque(self._spans, maxlen=app.config.get('DEVICE_TIMING_BUFFER', 5000))
+
+    @contextmanager
+    def span(self, device, phase):
+        """Time the enclosed block; the outcome is 'error' if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(device, phase, time.perf_counter() - started, ERROR)
+            raise
+        self.record(device, phase, time.perf_counter() - started, OK)
+
+    def record(self, device, phase, duration, outcome=OK):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._spans.append(Span(time.time(), device, phase, duration, outcome))
+
+    def spans(self):
+        """Buffered spans, oldest first"""
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self):
+        """
+        One row per (device, phase), sorted by device then phase:
+        count, errors and p50/p95/p99/max in milliseconds.
+        """
+        groups = {}
+        for span in self.spans():
+            groups.setdefault((span.device, span.phase), []).append(span)
+
+        rows = []
+        for (device, phase), spans in sorted(groups.items()):
+            durations = sorted(span.duration * 1000 for span in spans)
+            rows.append({
+                'device': device,
+                'phase': phase,
+                'count': len(spans),
+                'errors': sum(1 for span in spans if span.outcome == ERROR),
+                'p50': percentile(durations, 0.50),
+                'p95': percentile(durations, 0.95),
+                'p99': percentile(durations, 0.99),
+                'max': durations[-1],
+            })
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+# Create instance
+device_timings = DeviceTimings()
@@ -0,0 +1,210 @@
+"""
+Config Change Job Queue
+Diversion changes are stored as ConfigJob rows and applied by a background
+worker, one job at a time per device in submission (FIFO) order, so the
+HTTP request never waits for the gateway. Jobs are claimed with a
+conditional UPDATE and a renewed lease, so several worker processes can
+share the queue without running a job twice.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from models import db, AuditLog, ConfigJob, Device
+from cisco_driver import CiscoVGDriver
+from services.device_executor import DeviceBusyError
+import threading
+import logging
+import socket
+import uuid
+import os
+
+
+class JobQueue:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = False
+        self.workers = 2
+        self.poll_interval = 2
+        self.busy_backoff = 5
+        self.lease = 60
+        # Identifies this process's claims in ConfigJob.owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(__name__)
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the job queue with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('JOB_QUEUE_ENABLED', False)
+        self.workers = app.config.get('JOB_QUEUE_WORKERS', 2)
+        self.poll_interval = app.config.get('JOB_QUEUE_POLL_INTERVAL', 2)
+        self.busy_backoff = app.config.get('JOB_QUEUE_BUSY_BACKOFF', 5)
+        self.lease = app.config.get('JOB_QUEUE_LEASE', 60)
+
+    def submit(self, device_id, user_id, rule_set, changes):
+        """Store a change as a queued job and wake the worker. Returns the ConfigJob."""
+        job = ConfigJob(device_id=device_id, user_id=user_id, rule_set=rule_set)
+        job.set_changes(changes)
+        db.session.add(job)
+        db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def start(self):
+        """Start the dispatcher thread (no-op when disabled or already running)"""
+        with self._lock:
+            if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='config-job')
+            self._thread = threading.Thread(target=self._run, name='job-dispatcher', daemon=True)
+            self._thread.start()
+        self.logger.info(f"Job queue started ({self.workers} workers)")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self._dispatch()
+            except Exception as e:
+                self.logger.warning(f"Job dispatcher error: {e}")
+
+    def _dispatch(self):
+        """
+        Start the head job of every device that is free in every process: the
+        oldest unfinished job, if it is queued (and past any busy backoff) or
+        'running' under an expired lease (its process died)
+        """
+        with self.app.app_context():
+            now = datetime.utcnow()
+            self._renew_leases(now)
+            unfinished = ConfigJob.query.filter(
+                ConfigJob.status.in_([ConfigJob.QUEUED, ConfigJob.RUNNING])
+            ).order_by(ConfigJob.id).all()
+            heads = {}
+            for job in unfinished:
+                # Only the head of each device's queue may start (FIFO)
+                heads.setdefault(job.device_id, job)
+
+            for device_id, job in heads.items():
+                if job.status == ConfigJob.RUNNING and job.leased_until is not None and job.leased_until >= now:
+                    # Running here or in another live process
+                    continue
+                if job.not_before is not None and job.not_before > now:
+                    # Device pool was busy: wait out the backoff
+                    continue
+                with self._lock:
+                    if device_id in self._running:
+                        continue
+                    self._running.add(device_id)
+                if self._claim(job, now):
+                    self._executor.submit(self._execute, job.id, device_id)
+                else:
+                    with self._lock:
+                        self._running.discard(device_id)
+
+    def _claim(self, job, now):
+        """Atomically take a job; False when another process got there first"""
+        # Read before the UPDATE: the commit expires job, which then reloads as ours
+        was_running, previous_owner = job.status == ConfigJob.RUNNING, job.owner
+        if not was_running:
+            claimable = ConfigJob.status == ConfigJob.QUEUED
+        else:
+            claimable = (ConfigJob.status == ConfigJob.RUNNING) & or_(
+                ConfigJob.leased_until.is_(None), ConfigJob.leased_until < now)
+        claimed = ConfigJob.query.filter(ConfigJob.id == job.id, claimable).update({
+            'status': ConfigJob.RUNNING,
+            'owner': self.owner,
+            'started_at': now,
+            'leased_until': now + timedelta(seconds=self.lease),
+            'not_before': None,
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed and was_running:
+            # Rule lines are idempotent, so re-applying an interrupted job is safe
+            self.logger.warning(f"Config job {job.id} lost its worker ({previous_owner}), running it again")
+        return claimed == 1
+
+    def _renew_leases(self, now):
+        """Heartbeat: keep the claims of this process's running jobs alive"""
+        with self._lock:
+            if not self._running:
+                return
+        ConfigJob.query.filter_by(owner=self.owner, status=ConfigJob.RUNNING).update(
+            {'leased_until': now + timedelta(seconds=self.lease)}, synchronize_session=False)
+        db.session.commit()
+
+    def _finish(self, job_id, values):
+        """Store a job's outcome if this process still owns it (not committed yet)"""
+        return ConfigJob.query.filter_by(id=job_id, owner=self.owner, status=ConfigJob.RUNNING).update(
+            values, synchronize_session=False) == 1
+
+    def _fail(self, job_id, error):
+        """Mark a job that crashed outside the device call as failed"""
+        try:
+            with self.app.app_context():
+                db.session.rollback()
+                if self._finish(job_id, {'status': ConfigJob.FAILED, 'error': f"Job crashed: {error}",
+                                         'finished_at': datetime.utcnow()}):
+                    db.session.commit()
+        except Exception as e:
+            self.logger.warning(f"Could not mark config job {job_id} failed: {e}")
+
+    def _execute(self, job_id, device_id):
+        busy = False
+        try:
+            with self.app.app_context():
+                job = ConfigJob.query.get(job_id)
+                device = Device.query.get(device_id)
+                changes = job.get_changes()
+                try:
+                    CiscoVGDriver(device).update_diversions(changes, job.rule_set)
+                except DeviceBusyError:
+                    # Not a failure: leave it at the head of the device's queue and retry
+                    # after a backoff, instead of hammering a full pool (and the database)
+                    busy = True
+                    values = {
+                        'status': ConfigJob.QUEUED, 'started_at': None, 'owner': None, 'leased_until': None,
+                        'not_before': datetime.utcnow() + timedelta(seconds=self.busy_backoff),
+                    }
+                except Exception as e:
+                    values = {'status': ConfigJob.FAILED, 'error': str(e), 'finished_at': datetime.utcnow()}
+                else:
+                    values = {'status': ConfigJob.DONE, 'finished_at': datetime.utcnow()}
+
+                if not self._finish(job_id, values):
+                    db.session.rollback()
+                    self.logger.warning(f"Config job {job_id} was taken over by another worker")
+                    return
+                if values['status'] == ConfigJob.DONE:
+                    # Log to DB
+                    for change in changes:
+                        db.session.add(AuditLog(
+                            user_id=job.user_id,
+                            device_name=device.name,
+                            action="Change Diversion",
+                            details=f"Rule-set {job.rule_set} rule {change['rule_id']}: {change['raw_source']} -> {change['new_destination']}"
+                        ))
+                db.session.commit()
+        except Exception as e:
+            self.logger.warning(f"Config job {job_id} crashed: {e}")
+            # Otherwise it stays 'running' under this owner, its lease renewed forever
+            self._fail(job_id, e)
+        finally:
+            with self._lock:
+                self._running.discard(device_id)
+            # The device may have more jobs waiting (a busy job waits for its backoff)
+            if not busy:
+                self._wakeup.set()
+
+
+# Create instance
+job_queue = JobQueue()
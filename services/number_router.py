@@ -0,0 +1,158 @@
+"""
+Number Routing Simulator
+Answers "where does this number go?" from the cached translation rules,
+without a telnet session. Rules are compiled per device and rule set into
+a matcher with Cisco's first-match semantics: anchored literal patterns
+('^677250412') live in a prefix trie, everything else falls back to
+compiled regexes.
+"""
+
+from collections import namedtuple
+import threading
+import logging
+import re
+
+# One lookup answer; rule is None when no rule matches (the number passes unchanged)
+Route = namedtuple('Route', ['device_id', 'device', 'rule_set', 'number', 'rule', 'result', 'age'])
+
+_LITERAL_PATTERN = re.compile(r"\^[0-9]*$")
+
+
+def cisco_regex(pattern):
+    """
+    Python regex for a translation-rule match pattern. Cisco groups with
+    escaped parentheses ('^9\\(.*\\)') and treats bare ones as literals.
+    """
+    converted = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            converted.append(char if char in '()' else '\\' + char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in '()':
+            converted.append('\\' + char)
+        else:
+            converted.append(char)
+    if escaped:
+        converted.append('\\\\')
+    return re.compile(''.join(converted))
+
+
+class _Node:
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+        self.children = {}
+        # (position, rule) of the first rule whose literal prefix ends here
+        self.rule = None
+
+
+class RuleMatcher:
+    """Compiled rules of one rule set; match() returns the first rule that applies"""
+
+    def __init__(self, rules):
+        self.logger = logging.getLogger(__name__)
+        self._trie = _Node()
+        # [(position, compiled, rule)] in rule order
+        self._regexes = []
+        ordered = sorted(rules, key=lambda rule: int(rule['id']))
+        for position, rule in enumerate(ordered):
+            pattern = rule['raw_source']
+            if _LITERAL_PATTERN.match(pattern):
+                node = self._trie
+                for digit in pattern[1:]:
+                    node = node.children.setdefault(digit, _Node())
+                if node.rule is None:
+                    node.rule = (position, rule)
+                continue
+            try:
+                self._regexes.append((position, cisco_regex(pattern), rule))
+            except re.error as e:
+                self.logger.warning(f"Rule {rule['id']} pattern '{pattern}' not simulated: {e}")
+
+    def match(self, number):
+        """(rule, translated number) of the first matching rule, or None"""
+        # Earliest literal rule along the number's prefixes
+        best = self._trie.rule
+        node = self._trie
+        for digit in number:
+            node = node.children.get(digit)
+            if node is None:
+                break
+            if node.rule is not None and (best is None or node.rule[0] < best[0]):
+                best = node.rule
+
+        # Only regex rules ahead of that literal rule can still win
+        for position, compiled, rule in self._regexes:
+            if best is not None and position > best[0]:
+                break
+            found = compiled.search(number)
+            if found:
+                try:
+                    replaced = found.expand(rule['destination'].replace('\\0', '\\g<0>'))
+                except (re.error, IndexError):
+                    replaced = rule['destination']
+                return rule, number[:found.start()] + replaced + number[found.end():]
+
+        if best is None:
+            return None
+        rule = best[1]
+        return rule, rule['destination'] + number[len(rule['raw_source']) - 1:]
+
+
+class NumberRouter:
+    def __init__(self, app=None):
+        self.app = app
+        self.max_numbers = 1000
+        self.logger = logging.getLogger(__name__)
+        # {(device_id, rule_set): (snapshot, RuleMatcher)}
+        self._matchers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the number router with Flask app"""
+        self.app = app
+        self.max_numbers = app.config.get('ROUTING_MAX_NUMBERS', 1000)
+
+    def matcher(self, device_id, rule_set, snapshot):
+        """RuleMatcher for a device's rule set, compiled once per snapshot"""
+        key = (device_id, int(rule_set))
+        with self._lock:
+            cached = self._matchers.get(key)
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        matcher = RuleMatcher(snapshot.get_rules(rule_set))
+        with self._lock:
+            self._matchers[key] = (snapshot, matcher)
+        return matcher
+
+    def route(self, devices, numbers, rule_set, snapshots):
+        """
+        Routes every number through rule_set on every device with a
+        snapshot ({device_id: RuleSnapshot}). Returns {number: [Route, ...]}.
+        """
+        routes = {number: [] for number in numbers}
+        for device in devices:
+            snapshot = snapshots.get(device.id)
+            if snapshot is None:
+                continue
+            matcher = self.matcher(device.id, rule_set, snapshot)
+            for number in routes:
+                found = matcher.match(number)
+                rule, result = found if found is not None else (None, number)
+                routes[number].append(Route(device.id, device.name, int(rule_set), number, rule, result, snapshot.age))
+        return routes
+
+    def forget(self, device_id):
+        """Drop the compiled matchers of a device"""
+        with self._lock:
+            for key in [key for key in self._matchers if key[0] == device_id]:
+                del self._matchers[key]
+
+
+# Create instance
+number_router = NumberRouter()
@@ -0,0 +1,143 @@
+"""
+Rule Snapshot Cache
+Keeps the last parsed translation-rule read per device for a short TTL
+so repeated page views do not open a telnet session each time.
+Every live read is also persisted to the ConfigSnapshot table; when the
+background config poller is enabled, reads fall back to that table.
+"""
+
+from flask import has_app_context
+from datetime import datetime, timezone
+from models import db, ConfigSnapshot
+import threading
+import logging
+import hashlib
+import json
+import time
+
+
+class RuleSnapshot:
+    """Parsed translation-rule sets read from a device at a point in time"""
+
+    def __init__(self, rule_sets, fetched_at=None):
+        # {rule_set_number: [rule, ...]}
+        self.rule_sets = rule_sets
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    def get_rules(self, rule_set):
+        """Rules of one rule set, or an empty list if the device has no such set"""
+        return self.rule_sets.get(int(rule_set), [])
+
+    def digest(self, rule_set):
+        """Stable hash of one rule set's rules, usable as an HTTP ETag"""
+        canonical = json.dumps(self.get_rules(rule_set), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(f"{int(rule_set)}:{canonical}".encode('utf-8')).hexdigest()
+
+    @property
+    def age(self):
+        """Seconds since the rules were read from the device"""
+        return max(0, int(time.time() - self.fetched_at))
+
+
+class RuleCache:
+    def __init__(self, app=None):
+        self.app = app
+        self.ttl = 60
+        # Max age of a persisted snapshot still served instead of a live read (0 = never)
+        self.persisted_max_age = 0
+        self.logger = logging.getLogger(__name__)
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the rule cache with Flask app"""
+        self.app = app
+        self.ttl = app.config.get('RULE_CACHE_TTL', 60)
+        if app.config.get('CONFIG_POLL_ENABLED', False):
+            self.persisted_max_age = app.config.get('CONFIG_SNAPSHOT_MAX_AGE', 900)
+
+    def get(self, device_id):
+        """Return the cached snapshot for a device, or None if missing or expired"""
+        with self._lock:
+            snapshot = self._snapshots.get(device_id)
+        if snapshot is not None and time.time() - snapshot.fetched_at <= self.ttl:
+            return snapshot
+
+        if self.persisted_max_age and has_app_context():
+            snapshot = self._load(device_id, current_only=True)
+            if snapshot is not None and time.time() - snapshot.fetched_at <= self.persisted_max_age:
+                with self._lock:
+                    self._snapshots[device_id] = snapshot
+                return snapshot
+        return None
+
+    def latest(self, device_id):
+        """
+        Newest snapshot known for a device whatever its age (memory, then
+        the persisted table), or None. For answers where stale rules with
+        their age beat a live read, like the number routing simulator.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(device_id)
+        if snapshot is None and has_app_context():
+            snapshot = self._load(device_id)
+            if snapshot is not None:
+                with self._lock:
+                    snapshot = self._snapshots.setdefault(device_id, snapshot)
+        return snapshot
+
+    def put(self, device_id, rule_sets):
+        """Store freshly read rule sets for a device"""
+        snapshot = RuleSnapshot(rule_sets)
+        with self._lock:
+            self._snapshots[device_id] = snapshot
+        if has_app_context():
+            self._store(device_id, snapshot)
+        return snapshot
+
+    def invalidate(self, device_id):
+        """Drop the cached snapshot for a device, so its next read goes live"""
+        with self._lock:
+            self._snapshots.pop(device_id, None)
+        if has_app_context():
+            # Otherwise get() would fall back to the persisted (pre-write) rules
+            try:
+                ConfigSnapshot.query.filter_by(device_id=device_id).update({'stale': True})
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.logger.warning(f"Could not mark rule snapshot of device {device_id} stale: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def _load(self, device_id, current_only=False):
+        row = ConfigSnapshot.query.filter_by(device_id=device_id).first()
+        if row is None or row.fetched_at is None or (current_only and row.stale):
+            return None
+        fetched_at = row.fetched_at.replace(tzinfo=timezone.utc).timestamp()
+        return RuleSnapshot(row.get_rule_sets(), fetched_at)
+
+    def _store(self, device_id, snapshot):
+        try:
+            row = ConfigSnapshot.query.filter_by(device_id=device_id).first()
+            if row is None:
+                row = ConfigSnapshot(device_id=device_id)
+                db.session.add(row)
+            row.set_rule_sets(snapshot.rule_sets)
+            row.fetched_at = datetime.utcfromtimestamp(snapshot.fetched_at)
+            row.last_attempt = row.fetched_at
+            row.last_error = None
+            row.stale = False
+            db.session.commit()
+        except Exception as e:
+            # Persisting is best effort; the in-memory snapshot is still valid
+            db.session.rollback()
+            self.logger.warning(f"Could not persist rule snapshot for device {device_id}: {e}")
+
+
+# Create instance
+rule_cache = RuleCache()
@@ -0,0 +1,128 @@
+"""
+Deferred Save Scheduler
+Coalesces 'write memory' per device: changes go to running-config right
+away and one save is issued after a quiet period or a max-delay deadline
+"""
+
+import threading
+import logging
+import atexit
+import time
+
+
+class _PendingSave:
+    def __init__(self, save_fn, now):
+        self.save_fn = save_fn
+        self.first_change = now
+        self.last_change = now
+        self.last_error = None
+
+
+class SaveScheduler:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = False
+        self.quiet_period = 30
+        self.max_delay = 120
+        self.logger = logging.getLogger(__name__)
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._worker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the save scheduler with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('DEFERRED_SAVE_ENABLED', False)
+        self.quiet_period = app.config.get('DEFERRED_SAVE_QUIET_PERIOD', 30)
+        self.max_delay = app.config.get('DEFERRED_SAVE_MAX_DELAY', 120)
+        atexit.register(self.flush_all)
+
+    def schedule(self, device_id, save_fn):
+        """Record that device_id has unsaved changes; save_fn() writes them to NVRAM"""
+        now = time.monotonic()
+        with self._cond:
+            pending = self._pending.get(device_id)
+            if pending is None:
+                self._pending[device_id] = _PendingSave(save_fn, now)
+            else:
+                pending.save_fn = save_fn
+                pending.last_change = now
+            self._ensure_worker()
+            self._cond.notify()
+
+    def pending(self, device_id):
+        """
+        Return the pending-save status for a device, or None if nothing is pending.
+        'due_in' is the number of seconds until the save is issued.
+        """
+        with self._cond:
+            pending = self._pending.get(device_id)
+            if pending is None:
+                return None
+            return {
+                'since': int(time.monotonic() - pending.first_change),
+                'due_in': max(0, int(self._due_at(pending) - time.monotonic())),
+                'last_error': pending.last_error,
+            }
+
+    def flush(self, device_id):
+        """Save one device right now. Returns False if nothing was pending."""
+        with self._cond:
+            pending = self._pending.pop(device_id, None)
+        if pending is None:
+            return False
+        self._run(device_id, pending)
+        return True
+
+    def flush_all(self):
+        """Save every device with pending changes (used on service shutdown)"""
+        with self._cond:
+            device_ids = list(self._pending)
+        for device_id in device_ids:
+            self.flush(device_id)
+
+    def _due_at(self, pending):
+        return min(pending.last_change + self.quiet_period,
+                   pending.first_change + self.max_delay)
+
+    def _run(self, device_id, pending):
+        try:
+            pending.save_fn()
+        except Exception as e:
+            self.logger.warning(f"Deferred save for device {device_id} failed: {e}")
+            pending.last_error = str(e)
+            # Keep the changes pending and try again after another quiet period
+            with self._cond:
+                if device_id not in self._pending:
+                    pending.first_change = pending.last_change = time.monotonic()
+                    self._pending[device_id] = pending
+                    self._cond.notify()
+            return False
+        return True
+
+    def _ensure_worker(self):
+        # Called with self._cond held
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._work_loop, name='save-scheduler', daemon=True)
+        self._worker.start()
+
+    def _work_loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [(device_id, p) for device_id, p in self._pending.items() if self._due_at(p) <= now]
+                for device_id, _ in due:
+                    del self._pending[device_id]
+                if not due:
+                    next_due = min((self._due_at(p) for p in self._pending.values()), default=None)
+                    self._cond.wait(None if next_due is None else next_due - now)
+                    continue
+            for device_id, pending in due:
+                self._run(device_id, pending)
+
+
+# Create instance
+save_scheduler = SaveScheduler()
@@ -0,0 +1,223 @@
+"""
+Device Session Pool
+Keeps authenticated, enable-mode telnet sessions open between requests
+so repeat visits to a gateway skip the login/enable handshake
+"""
+
+from netmiko import ConnectHandler
+from services.device_timings import device_timings, OK, ERROR
+import threading
+import logging
+import atexit
+import time
+
+
+class _PooledSession:
+    """One pooled connection slot for a single device"""
+
+    def __init__(self):
+        # Netmiko connections are not thread-safe: one user at a time
+        self.lock = threading.Lock()
+        self.connection = None
+        self.params_key = None
+        self.last_used = 0.0
+
+
+class SessionPool:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = True
+        self.idle_timeout = 300
+        self.reap_interval = 30
+        self.logger = logging.getLogger(__name__)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the session pool with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('DEVICE_SESSION_POOL_ENABLED', True)
+        self.idle_timeout = app.config.get('DEVICE_SESSION_IDLE_TIMEOUT', 300)
+        self.reap_interval = app.config.get('DEVICE_SESSION_REAP_INTERVAL', 30)
+        atexit.register(self.close_all)
+
+    def run(self, device_id, device_params, operation, name=None):
+        """
+        Run operation(net_connect) on a warm session for device_id.
+        A reused session that fails is dropped and the operation retried
+        once on a fresh connection, so a session the router closed behind
+        our back never surfaces as an error.
+        name tags the connect/login/enable timing spans (defaults to device_id).
+        """
+        name = name or str(device_id)
+        if not self.enabled:
+            net_connect = self._connect(device_params, name)
+            try:
+                return operation(net_connect)
+            finally:
+                net_connect.disconnect()
+
+        entry = self._get_entry(device_id)
+        with entry.lock:
+            reused = self._checkout(entry, device_params, name)
+            try:
+                result = operation(entry.connection)
+            except Exception as e:
+                self._close(entry)
+                if not reused:
+                    raise
+                self.logger.info(f"Pooled session for device {device_id} failed ({e}), reconnecting")
+                self._checkout(entry, device_params, name)
+                try:
+                    result = operation(entry.connection)
+                except Exception:
+                    self._close(entry)
+                    raise
+            entry.last_used = time.monotonic()
+
+        self._ensure_reaper()
+        return result
+
+    def discard(self, device_id):
+        """Close and forget the session for a device (e.g. after its settings changed)"""
+        with self._lock:
+            entry = self._sessions.pop(device_id, None)
+        if entry is not None:
+            with entry.lock:
+                self._close(entry)
+
+    def close_all(self):
+        """Close every pooled session"""
+        with self._lock:
+            device_ids = list(self._sessions)
+        for device_id in device_ids:
+            self.discard(device_id)
+
+    def reap_idle(self):
+        """Close sessions idle longer than the configured timeout"""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._sessions.values())
+        for entry in entries:
+            # Skip sessions that are busy right now; they are clearly not idle
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if entry.connection is not None and now - entry.last_used > self.idle_timeout:
+                    self._close(entry)
+            finally:
+                entry.lock.release()
+
+    def _get_entry(self, device_id):
+        with self._lock:
+            entry = self._sessions.get(device_id)
+            if entry is None:
+                entry = _PooledSession()
+                self._sessions[device_id] = entry
+            return entry
+
+    def _checkout(self, entry, device_params, name):
+        """
+        Make sure entry holds a live, enable-mode connection.
+        Returns True if an existing session was reused.
+        """
+        params_key = tuple(sorted(device_params.items()))
+        if entry.connection is not None:
+            expired = time.monotonic() - entry.last_used > self.idle_timeout
+            if entry.params_key != params_key or expired or not self._is_alive(entry.connection):
+                self._close(entry)
+
+        if entry.connection is not None:
+            return True
+
+        entry.connection = self._connect(device_params, name)
+        entry.params_key = params_key
+        entry.last_used = time.monotonic()
+        return False
+
+    def _connect(self, device_params, name):
+        """
+        Open a new enable-mode connection, recording 'connect' (TCP connect
+        and session preparation), 'login' and 'enable' timing spans.
+        """
+        net_connect = ConnectHandler(**device_params, auto_connect=False)
+        login = {'duration': 0.0, 'failed': False}
+        telnet_login = net_connect.telnet_login
+
+        def timed_login(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with device_timings.span(name, 'login'):
+                    return telnet_login(*args, **kwargs)
+            except Exception:
+                login['failed'] = True
+                raise
+            finally:
+                login['duration'] = time.perf_counter() - started
+
+        net_connect.telnet_login = timed_login
+        started = time.perf_counter()
+        try:
+            net_connect._open()
+        except Exception:
+            # A failed login is already recorded as its own span
+            outcome = OK if login['failed'] else ERROR
+            device_timings.record(name, 'connect', time.perf_counter() - started - login['duration'], outcome)
+            net_connect.disconnect()
+            raise
+        device_timings.record(name, 'connect', time.perf_counter() - started - login['duration'])
+
+        try:
+            with device_timings.span(name, 'enable'):
+                net_connect.enable()
+        except Exception:
+            net_connect.disconnect()
+            raise
+        return net_connect
+
+    def _is_alive(self, net_connect):
+        try:
+            if not net_connect.is_alive():
+                return False
+            # The router drops back to user EXEC on some session events
+            if not net_connect.check_enable_mode():
+                net_connect.enable()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, entry):
+        if entry.connection is None:
+            return
+        try:
+            entry.connection.disconnect()
+        except Exception as e:
+            self.logger.debug(f"Error closing pooled session: {e}")
+        entry.connection = None
+        entry.params_key = None
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(
+                target=self._reap_loop, name='session-pool-reaper', daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                self.logger.warning(f"Session reaper error: {e}")
+
+
+# Create instance
+session_pool = SessionPool()
@@ -0,0 +1,152 @@
+"""
+Adaptive Netmiko Timing Profiles
+Learns a per-device timing profile (fast_cli, delay factor, read timeout)
+from measured command round-trip times, so healthy gateways run with
+fast_cli while slow or flaky ones get longer delays and timeouts
+"""
+
+from flask import has_app_context
+import threading
+import logging
+
+FAST = 'fast'
+STANDARD = 'standard'
+SLOW = 'slow'
+
+# Netmiko connection parameters of each profile; STANDARD is the historic behaviour
+PROFILES = {
+    FAST: {'fast_cli': True, 'global_delay_factor': 1},
+    STANDARD: {'fast_cli': False, 'global_delay_factor': 1},
+    SLOW: {'fast_cli': False, 'global_delay_factor': 2, 'read_timeout_override': 120},
+}
+
+
+class _Observation:
+    def __init__(self, profile):
+        self.profile = profile
+        self.average = None
+        self.samples = 0
+
+
+class TimingProfiles:
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = True
+        self.fast_threshold = 1.0
+        self.slow_threshold = 5.0
+        self.min_samples = 5
+        self.smoothing = 0.3
+        self.logger = logging.getLogger(__name__)
+        self._devices = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the timing profile learner with Flask app"""
+        self.app = app
+        self.enabled = app.config.get('TIMING_PROFILE_LEARNING', True)
+        self.fast_threshold = app.config.get('TIMING_FAST_THRESHOLD', 1.0)
+        self.slow_threshold = app.config.get('TIMING_SLOW_THRESHOLD', 5.0)
+        self.min_samples = app.config.get('TIMING_MIN_SAMPLES', 5)
+
+    def connection_params(self, device):
+        """
+        Netmiko timing parameters for a Device: the learned profile, with the
+        manual overrides from the admin form (fast_cli, delay_factor,
+        read_timeout) taking precedence.
+        """
+        params = dict(PROFILES[self.profile(device)])
+        if device.fast_cli is not None:
+            params['fast_cli'] = device.fast_cli
+        if device.delay_factor:
+            params['global_delay_factor'] = device.delay_factor
+        if device.read_timeout:
+            params['read_timeout_override'] = device.read_timeout
+        return params
+
+    def profile(self, device):
+        """Learned profile name for a Device (STANDARD until enough samples)"""
+        stored = device.timing_profile if device.timing_profile in PROFILES else STANDARD
+        with self._lock:
+            # Later observations start from the stored profile
+            return self._devices.setdefault(device.id, _Observation(stored)).profile
+
+    def observe(self, device_id, seconds):
+        """Record a successful command round trip"""
+        if not self.enabled:
+            return
+        with self._lock:
+            observation = self._devices.setdefault(device_id, _Observation(STANDARD))
+            if observation.average is None:
+                observation.average = seconds
+            else:
+                observation.average += self.smoothing * (seconds - observation.average)
+            observation.samples += 1
+            if observation.samples < self.min_samples:
+                return
+            if observation.average <= self.fast_threshold:
+                changed = self._switch(observation, FAST)
+            elif observation.average >= self.slow_threshold:
+                changed = self._switch(observation, SLOW)
+            else:
+                changed = None
+        if changed:
+            self._persist(device_id, changed)
+
+    def record_failure(self, device_id):
+        """A command failed or timed out: step one profile towards SLOW and relearn"""
+        if not self.enabled:
+            return
+        with self._lock:
+            observation = self._devices.setdefault(device_id, _Observation(STANDARD))
+            changed = self._switch(observation, STANDARD if observation.profile == FAST else SLOW)
+        if changed:
+            self._persist(device_id, changed)
+
+    def forget(self, device_id):
+        """Drop what was learned about a device (e.g. after its settings changed)"""
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def _switch(self, observation, profile):
+        # A new profile changes the round-trip times: start measuring afresh
+        observation.average = None
+        observation.samples = 0
+        if observation.profile == profile:
+            return None
+        observation.profile = profile
+        return profile
+
+    def _persist(self, device_id, profile):
+        self.logger.info(f"Device {device_id} timing profile: {profile}")
+        with self._lock:
+            self._pending[device_id] = profile
+
+    def save_pending(self):
+        """
+        Store newly learned profiles on their Device rows so they survive
+        restarts. Best effort, and only where an app context exists: profiles
+        are learned on device worker threads, so callers flush them afterwards.
+        """
+        if not has_app_context():
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        from models import db, Device
+        try:
+            for device_id, profile in pending.items():
+                device = Device.query.get(device_id)
+                if device is not None:
+                    device.timing_profile = profile
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.warning(f"Could not store learned timing profiles: {e}")
+
+
+# Create instance
+timing_profiles = TimingProfiles()
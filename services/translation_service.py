@@ -3,22 +3,77 @@ Translation Service for multi-language support
 Handles language detection, translation lookup, and caching
 """
 
-from flask import request, session, g
-from models import Language, Translation
-from functools import lru_cache
+from flask import request, session, g, has_app_context
+from flask.templating import Environment
+from jinja2.ext import Extension
+from jinja2.lexer import Token
+from models import db, Language, Translation
+from sqlalchemy import func
+from types import MappingProxyType
+import threading
 import logging
+import time
+import re
+
+DEFAULT_LANGUAGE = 'en-US'
+
+def fallback_chain(language_code):
+    """Languages searched for a key, most specific first"""
+    if language_code == DEFAULT_LANGUAGE:
+        return (language_code,)
+    return (language_code, DEFAULT_LANGUAGE)
+
+# Catalog of a language when not even the default language has one; shared so
+# templates compiled against it are reused (overlays are keyed by catalog identity)
+_EMPTY_CATALOG = MappingProxyType({})
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+class MessageTemplate:
+    """A translated value parsed once into literal segments and {placeholder} slots"""
+    __slots__ = ('parts', 'slots')
+
+    def __init__(self, value):
+        # Literals at even positions, placeholder names at odd ones
+        self.parts = tuple(_PLACEHOLDER.split(value))
+        self.slots = frozenset(self.parts[1::2])
+
+    def render(self, params):
+        """Fills the slots from params; a missing parameter leaves its {placeholder} as is"""
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            parts[i] = str(params[name]) if name in params else '{' + name + '}'
+        return ''.join(parts)
 
 class TranslationService:
     def __init__(self, app=None):
         self.app = app
-        self._translation_cache = None
+        # {language_code: read-only {key: value}} with fallbacks already merged in,
+        # shared by every request: lookups are keyed by the resolved language
+        self._catalogs = None
+        # {language_code: read-only {key: MessageTemplate}} for values with placeholders
+        self._messages = {}
+        # Called as hook(key, language_code, missing, extra) when params do not fit a message
+        self.param_hook = self._log_param_mismatch
+        # Catalog loads from the database (every other lookup is a cache hit)
+        self.loads = 0
+        # {language_code: Language.catalog_version} the catalogs were built from
+        self._versions = {}
+        self._checked_at = 0
+        self.version_check_interval = 5
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
         if app is not None:
             self.init_app(app)
 
     def init_app(self, app):
         """Initialize the translation service with Flask app"""
         self.app = app
-        self.logger = logging.getLogger(__name__)
+        self.version_check_interval = app.config.get('TRANSLATION_VERSION_CHECK_INTERVAL', 5)
+
+        # Found by TranslatingEnvironment, which inlines translations per language
+        app.extensions['translation_service'] = self
 
         # Set up request processing
         app.before_request(self._before_request)
@@ -27,9 +82,12 @@ class TranslationService:
     def _before_request(self):
         """Set up translation context before each request"""
         # Get language from session, cookie, or default
-        language_code = session.get('language', 'en-US')
+        language_code = session.get('language', DEFAULT_LANGUAGE)
         g.current_language = language_code
 
+        # Pick up translations changed by other processes (at most every few seconds)
+        self.check_versions()
+
     def _context_processor(self):
         """Make translation functions available in templates"""
         return {
@@ -40,45 +98,124 @@ class TranslationService:
         }
 
     def get_current_language(self):
-        """Get the current language code"""
-        return getattr(g, 'current_language', 'en-US')
+        """Get the current language code (resolved once per request in _before_request)"""
+        if not has_app_context():
+            return DEFAULT_LANGUAGE
+        return getattr(g, 'current_language', DEFAULT_LANGUAGE)
 
     def get_available_languages(self):
         """Get all available languages"""
         return Language.query.filter_by(is_active=True).all()
 
-    def get_translation(self, key, language_code=None):
+    def load_catalogs(self):
         """
-        Get translation for a given key
-        Uses caching for better performance
+        Reads the translations of every active language in one query and
+        builds an immutable catalog per language, with its fallback chain
+        merged in, so a lookup is a single dict access
         """
-        # Initialize cache if not exists
-        if self._translation_cache is None:
-            self._translation_cache = lru_cache(maxsize=1000)(self._get_translation_uncached)
+        with self._lock:
+            return self._load()
 
-        return self._translation_cache(key, language_code)
+    def _load(self, language_codes=None):
+        """(Re)builds the catalogs of language_codes, or of every language when None"""
+        query = db.session.query(Translation.language_code, Translation.key, Translation.value,
+                                 Language.catalog_version) \
+            .join(Language, Language.code == Translation.language_code) \
+            .filter(Language.is_active == True)
+        if language_codes is not None:
+            needed = {fallback for code in language_codes for fallback in fallback_chain(code)}
+            query = query.filter(Translation.language_code.in_(needed))
+        rows = query.all()
 
-    def _get_translation_uncached(self, key, language_code=None):
-        """Uncached version of translation lookup"""
-        if language_code is None:
-            # Get language directly from session to avoid caching issues
-            language_code = session.get('language', 'en-US')
+        values = {}
+        versions = {}
+        for language_code, key, value, version in rows:
+            values.setdefault(language_code, {})[key] = value
+            versions[language_code] = version
+
+        # Copy on write: lookups keep using the old dicts until the swap below
+        catalogs = {} if language_codes is None else dict(self._catalogs or {})
+        messages = {} if language_codes is None else dict(self._messages)
+        for language_code in (values if language_codes is None else language_codes):
+            if language_code not in values:
+                # Deactivated, or its last translation was deleted
+                catalogs.pop(language_code, None)
+                messages.pop(language_code, None)
+                continue
+            merged = {}
+            # Least specific first, so the language's own values win
+            for fallback in reversed(fallback_chain(language_code)):
+                merged.update(values.get(fallback, {}))
+            catalogs[language_code] = MappingProxyType(merged)
+            messages[language_code] = MappingProxyType({
+                key: MessageTemplate(value) for key, value in merged.items() if _PLACEHOLDER.search(value)
+            })
 
-        # Try to get from database
-        translation = Translation.query.filter_by(
-            key=key,
-            language_code=language_code
-        ).first()
+        self._messages = messages
+        self._catalogs = catalogs
+        self._versions.update(versions)
+        self.loads += 1
+        self.logger.info(f"Loaded {len(rows)} translations for {len(values)} language(s)")
+        return catalogs
 
-        if translation:
-            return translation.value
+    def check_versions(self, force=False):
+        """
+        Compares the catalog versions in the database with those loaded and
+        reloads only the languages that changed (and those falling back to
+        them). Runs at most once per version_check_interval unless forced.
+        Returns the reloaded language codes.
+        """
+        now = time.monotonic()
+        if self._catalogs is None or (not force and now - self._checked_at < self.version_check_interval):
+            return []
+        self._checked_at = now
+
+        languages = db.session.query(Language.code, Language.catalog_version, Language.is_active).all()
+        # Inactive languages have no catalog to refresh
+        changed = {code for code, version, is_active in languages
+                   if self._versions.get(code) != version and (is_active or code in self._catalogs)}
+        stale = set()
+        with self._lock:
+            if changed:
+                stale = changed | {code for code in self._catalogs if changed & set(fallback_chain(code))}
+                self._load(stale)
+            # Also remembers languages that have no translations to load
+            self._versions.update({code: version for code, version, is_active in languages})
+        return sorted(stale)
 
-        # Fallback to English if not current language
-        if language_code != 'en-US':
-            return self._get_translation_uncached(key, 'en-US')
+    def bump_versions(self, *language_codes):
+        """
+        Marks the catalogs of language_codes as changed, for this process and
+        every other one. Call after committing a translation write.
+        """
+        Language.query.filter(Language.code.in_(language_codes)).update(
+            {Language.catalog_version: func.coalesce(Language.catalog_version, 0) + 1},
+            synchronize_session=False)
+        db.session.commit()
+        self.check_versions(force=True)
 
-        # Return key as fallback if no translation found
-        return key
+    def get_catalog(self, language_code):
+        """Read-only catalog of a language (the default language's when it has none)"""
+        catalogs = self._catalogs
+        if catalogs is None:
+            # First lookup: concurrent requests wait for one load instead of each querying
+            with self._lock:
+                catalogs = self._catalogs if self._catalogs is not None else self._load()
+        catalog = catalogs.get(language_code)
+        if catalog is None:
+            catalog = catalogs.get(DEFAULT_LANGUAGE, _EMPTY_CATALOG)
+        return catalog
+
+    def get_translation(self, key, language_code=None):
+        """
+        Get translation for a given key
+        Served from the preloaded catalog of the request's resolved language
+        (or language_code); unknown keys return the key itself
+        """
+        if language_code is None:
+            language_code = self.get_current_language()
+
+        return self.get_catalog(language_code).get(key, key)
 
     def set_language(self, language_code):
         """Set the user's preferred language"""
@@ -88,29 +225,104 @@ class TranslationService:
             raise ValueError(f"Language {language_code} not available")
 
         session['language'] = language_code
-
-        # Clear translation cache when language changes
-        if self._translation_cache is not None:
-            self._translation_cache.cache_clear()
-
+        # The rest of this request renders in the new language; catalogs are shared
+        # per language, so nothing has to be flushed for other users
+        g.current_language = language_code
         return True
 
     def get_translation_with_params(self, key, params=None, language_code=None):
         """
         Get translation for a given key with parameter replacement
         Supports dynamic values like {username}, {device_name}, etc.
+        Messages are compiled when the catalog loads, so this is one join;
+        params that do not match the placeholders go to param_hook.
         """
         if params is None:
             params = {}
+        if language_code is None:
+            language_code = self.get_current_language()
+
+        catalog = self.get_catalog(language_code)
+        messages = self._messages
+        template = messages.get(language_code, messages.get(DEFAULT_LANGUAGE, {})).get(key)
+        if template is None:
+            # No placeholders (or an unknown key, returned as is)
+            if params and key in catalog:
+                self.param_hook(key, language_code, set(), set(params))
+            return catalog.get(key, key)
+
+        if template.slots.symmetric_difference(params):
+            self.param_hook(key, language_code, template.slots.difference(params), set(params).difference(template.slots))
+        return template.render(params)
+
+    def _log_param_mismatch(self, key, language_code, missing, extra):
+        """Default param_hook: a debug log line per mismatched call"""
+        self.logger.debug(f"Translation {key} ({language_code}): missing params {sorted(missing)}, "
+                          f"unused params {sorted(extra)}")
+
+class InlineTranslations(Extension):
+    """
+    Replaces get_translation('constant.key') with the translated text while
+    a language environment compiles a template, so constant labels cost
+    nothing at render time. Calls with computed keys are left alone.
+    """
+
+    def filter_stream(self, stream):
+        catalog = getattr(self.environment, 'catalog', None)
+        if catalog is None:
+            return stream
+        tokens = list(stream)
+        inlined = []
+        i = 0
+        while i < len(tokens):
+            call = tokens[i:i + 4]
+            if (len(call) == 4 and call[0].test('name:get_translation') and call[1].type == 'lparen'
+                    and call[2].type == 'string' and call[3].type == 'rparen'
+                    and (i == 0 or tokens[i - 1].type != 'dot')):
+                # Jinja escapes and folds the constant into the template's output
+                inlined.append(Token(call[0].lineno, 'string', catalog.get(call[2].value, call[2].value)))
+                i += 4
+            else:
+                inlined.append(tokens[i])
+                i += 1
+        return inlined
+
+
+class TranslatingEnvironment(Environment):
+    """
+    Flask's Jinja environment, compiling templates once per language with
+    InlineTranslations. Each language renders through an overlay environment
+    with its own template cache, replaced when that language's catalog is
+    reloaded (a new catalog version).
+    Install with app.jinja_environment = TranslatingEnvironment.
+    """
+    language = None
+    catalog = None
+
+    def __init__(self, app, **options):
+        options['extensions'] = [*options.get('extensions', ()), InlineTranslations]
+        super().__init__(app, **options)
+        # {language_code: overlay environment}
+        self._languages = {}
 
-        translation = self.get_translation(key, language_code)
+    def for_language(self, language_code):
+        """Overlay environment compiling templates for language_code's current catalog"""
+        catalog = self.app.extensions['translation_service'].get_catalog(language_code)
+        environment = self._languages.get(language_code)
+        if environment is None or environment.catalog is not catalog:
+            environment = self.overlay()
+            environment.language = language_code
+            environment.catalog = catalog
+            self._languages[language_code] = environment
+        return environment
 
-        # Replace placeholders with actual values
-        if params:
-            for placeholder, value in params.items():
-                translation = translation.replace('{' + placeholder + '}', str(value))
+    def _load_template(self, name, globals):
+        service = self.app.extensions.get('translation_service')
+        if self.language is not None or service is None or not has_app_context():
+            return super()._load_template(name, globals)
+        # Templates extended or included from here load through the same overlay
+        return self.for_language(service.get_current_language())._load_template(name, globals)
 
-        return translation
 
 # Create instance
 translation_service = TranslationService()
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from services.translation_service import translation_service
-from models import db, Language, Translation
+from models import db, Language, Translation, upgrade_schema
 from app import app
 
 def test_cache_clearing():
@@ -16,7 +16,7 @@ def test_cache_clearing():
 
     with app.app_context():
         # Set up test data
-        db.create_all()
+        upgrade_schema()
 
         # Add test languages
         if not Language.query.filter_by(code='en-US').first():
@@ -0,0 +1,81 @@
+import time
+from services.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, OPEN, CLOSED
+
+
+def failing():
+    raise OSError("TCP connection to device failed")
+
+
+def make_registry():
+    registry = CircuitBreakerRegistry()
+    registry.failure_threshold = 2
+    registry.cooldown = 0.2
+    return registry
+
+
+def test_breaker_opens_after_repeated_failures_and_fails_fast():
+    registry = make_registry()
+    calls = []
+
+    for _ in range(2):
+        try:
+            registry.call(1, failing)
+        except OSError:
+            pass
+    assert registry.state(1)['state'] == OPEN
+
+    try:
+        registry.call(1, lambda: calls.append(1))
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert calls == []
+
+    # Other devices are unaffected
+    assert registry.call(2, lambda: 'ok') == 'ok'
+
+
+def test_half_open_probe_closes_or_reopens():
+    registry = make_registry()
+    for _ in range(2):
+        try:
+            registry.call(1, failing)
+        except OSError:
+            pass
+
+    # Failed probe: open again for another cool-down
+    time.sleep(0.25)
+    try:
+        registry.call(1, failing)
+    except OSError:
+        pass
+    assert registry.state(1)['state'] == OPEN
+
+    # Successful probe: closed, failures forgotten
+    time.sleep(0.25)
+    assert registry.call(1, lambda: 'ok') == 'ok'
+    assert registry.state(1) == {'state': CLOSED, 'failures': 0, 'retry_in': 0, 'last_error': None}
+
+
+def test_abandoned_probe_lets_the_next_caller_probe():
+    registry = make_registry()
+    for _ in range(2):
+        try:
+            registry.call(1, failing)
+        except OSError:
+            pass
+
+    time.sleep(0.25)
+    # Let through as the probe, but the work never ran (e.g. the pool was full)
+    registry.check(1)
+    registry.abandon(1)
+    assert registry.state(1)['state'] == OPEN
+    assert registry.call(1, lambda: 'ok') == 'ok'
+    assert registry.state(1)['state'] == CLOSED
+
+
+if __name__ == '__main__':
+    test_breaker_opens_after_repeated_failures_and_fails_fast()
+    test_half_open_probe_closes_or_reopens()
+    test_abandoned_probe_lets_the_next_caller_probe()
+    print("All circuit breaker tests passed!")
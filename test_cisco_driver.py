@@ -0,0 +1,329 @@
+import threading
+import time
+import services.session_pool as session_pool_module
+from services.session_pool import ConnectHandler
+from services.session_pool import session_pool
+from services.rule_cache import rule_cache
+from services.circuit_breaker import device_breakers
+from services.device_executor import device_executor
+from services.device_timings import device_timings
+from cisco_driver import CiscoVGDriver, parse_translation_rules, parse_show_translation_rule, parse_rule_csv, plan_rule_sync
+
+RUNNING_CONFIG = """voice translation-rule 1
+ rule 1 /^999/ /111/
+voice translation-rule 2
+ rule 1 /^677250412/ /970202/ plan any unknown
+ rule 2 /^677250413/ /970203/ plan any unknown
+voice translation-rule 255
+ rule 1 /^0/ //
+ rule 2 /^1/ //
+!
+dial-peer voice 1 pots
+ rule 9 /^8/ /9/
+"""
+
+
+class FakeDevice:
+    def __init__(self, device_id=1):
+        self.id = device_id
+        self.name = f'VG{device_id:02d}'
+        self.ip_address = '10.0.0.1'
+        self.username = 'cisco'
+        self.password = 'cisco'
+        self.enable_password = 'cisco'
+        self.port = 23
+        self.conn_timeout = None
+        self.read_timeout = None
+        self.fast_cli = None
+        self.delay_factor = None
+        self.timing_profile = None
+        self.fetch_strategy = None
+
+
+class FakeConnection:
+    """Stand-in for a netmiko connection that records every command"""
+    commands = []
+    delay = 0
+
+    def __init__(self, **params):
+        pass
+
+    def _open(self):
+        self.telnet_login()
+
+    def telnet_login(self):
+        pass
+
+    def enable(self):
+        pass
+
+    def check_enable_mode(self):
+        return True
+
+    def is_alive(self):
+        return True
+
+    def send_command(self, command):
+        FakeConnection.commands.append(command)
+        time.sleep(FakeConnection.delay)
+        return RUNNING_CONFIG
+
+    def send_config_set(self, config_set):
+        FakeConnection.commands.extend(config_set)
+        return "\n".join(config_set)
+
+    def save_config(self):
+        FakeConnection.commands.append('write memory')
+
+    def disconnect(self):
+        pass
+
+
+def setup_function(function):
+    session_pool_module.ConnectHandler = FakeConnection
+    session_pool.close_all()
+    rule_cache.clear()
+    rule_cache.ttl = 60
+    device_breakers.reset(1)
+    FakeConnection.commands = []
+    FakeConnection.delay = 0
+    device_timings.clear()
+
+
+def teardown_function(function):
+    session_pool.close_all()
+    session_pool_module.ConnectHandler = ConnectHandler
+
+
+def test_parses_only_rule_set_2():
+    rules = CiscoVGDriver(FakeDevice()).get_diversions()
+
+    assert [r['id'] for r in rules] == ['1', '2']
+    assert rules[0]['source'] == '677250412'
+    assert rules[0]['raw_source'] == '^677250412'
+    assert rules[0]['destination'] == '970202'
+
+
+def test_parser_indexes_every_rule_set():
+    rule_sets = parse_translation_rules(RUNNING_CONFIG)
+
+    assert sorted(rule_sets) == [1, 2, 255]
+    assert [r['id'] for r in rule_sets[255]] == ['1', '2']
+    assert rule_sets[255][0]['destination'] == ''
+    assert rule_sets[1][0]['raw_source'] == '^999'
+
+
+def test_parses_show_translation_rule_output():
+    output = """Translation-rule tag: 2
+
+        Rule 1:
+        Match pattern: ^677250412
+        Replace pattern: 970202
+        Match type: none                Replace type: none
+        Match plan: none                Replace plan: none
+
+        Rule 2:
+        Match pattern: ^0
+        Replace pattern:
+        Match type: none                Replace type: none
+"""
+    assert parse_show_translation_rule(output) == [
+        {'id': '1', 'source': '677250412', 'destination': '970202', 'raw_source': '^677250412'},
+        {'id': '2', 'source': '0', 'destination': '', 'raw_source': '^0'},
+    ]
+
+
+def test_any_rule_set_is_served_from_one_fetch():
+    driver = CiscoVGDriver(FakeDevice())
+
+    assert len(driver.get_diversions(rule_set=1)) == 1
+    assert len(driver.get_diversions(rule_set=255)) == 2
+    assert driver.get_diversions(rule_set=7) == []
+    assert FakeConnection.commands.count("show run | section voice translation-rule") == 1
+
+
+def test_update_targets_selected_rule_set():
+    CiscoVGDriver(FakeDevice()).update_diversion('1', '^0', '5', rule_set=255)
+
+    assert FakeConnection.commands[0] == 'voice translation-rule 255'
+
+
+def test_reads_are_served_from_snapshot_cache():
+    driver = CiscoVGDriver(FakeDevice())
+
+    driver.get_diversions()
+    driver.get_diversions()
+    assert FakeConnection.commands.count("show run | section voice translation-rule") == 1
+
+    driver.get_diversions(refresh=True)
+    assert FakeConnection.commands.count("show run | section voice translation-rule") == 2
+
+
+def test_expired_snapshot_is_refetched():
+    driver = CiscoVGDriver(FakeDevice())
+    rule_cache.ttl = 0
+
+    snapshot = driver.get_snapshot()
+    snapshot.fetched_at -= 1
+    driver.get_snapshot()
+
+    assert FakeConnection.commands.count("show run | section voice translation-rule") == 2
+
+
+def test_update_returns_post_change_rules_from_same_session():
+    driver = CiscoVGDriver(FakeDevice())
+
+    snapshot = driver.update_diversion('1', '^677250412', '970299')
+
+    assert 'rule 1 /^677250412/ /970299/ plan any unknown' in FakeConnection.commands
+    assert FakeConnection.commands[-1] == "show run | section voice translation-rule"
+    assert rule_cache.get(1) is snapshot
+    assert [r['id'] for r in snapshot.get_rules(2)] == ['1', '2']
+
+    # Redrawing the page after the change needs no further device command
+    commands_before = len(FakeConnection.commands)
+    driver.get_diversions()
+    assert len(FakeConnection.commands) == commands_before
+
+
+def test_bulk_update_uses_one_context_and_one_save():
+    driver = CiscoVGDriver(FakeDevice())
+
+    driver.update_diversions([
+        {'rule_id': '1', 'raw_source': '^677250412', 'new_destination': '111'},
+        {'rule_id': '2', 'raw_source': '^677250413', 'new_destination': '222'},
+    ])
+
+    assert FakeConnection.commands.count('voice translation-rule 2') == 1
+    assert FakeConnection.commands.count('write memory') == 1
+    assert 'rule 2 /^677250413/ /222/ plan any unknown' in FakeConnection.commands
+
+
+def test_update_by_source_matches_display_or_raw_pattern():
+    driver = CiscoVGDriver(FakeDevice())
+
+    changes = driver.update_by_source('677250413', '333')
+    assert [c['rule_id'] for c in changes] == ['2']
+    assert 'rule 2 /^677250413/ /333/ plan any unknown' in FakeConnection.commands
+
+    assert driver.update_by_source('^999', '1', rule_set=1)[0]['rule_id'] == '1'
+    assert driver.update_by_source('000000', '1') == []
+
+
+def test_concurrent_reads_share_one_fetch():
+    FakeConnection.delay = 0.2
+    results = []
+
+    def read():
+        results.append(CiscoVGDriver(FakeDevice()).get_diversions(refresh=True))
+
+    threads = [threading.Thread(target=read) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5
+    assert all(rules == results[0] for rules in results)
+    assert FakeConnection.commands.count("show run | section voice translation-rule") == 1
+
+
+def test_operations_record_phase_timings():
+    driver = CiscoVGDriver(FakeDevice())
+    driver.get_diversions()
+    driver.update_diversion('1', '^677250412', '555')
+
+    phases = [(span.device, span.phase, span.outcome) for span in device_timings.spans()]
+    assert phases == [
+        ('VG01', 'login', 'ok'), ('VG01', 'connect', 'ok'), ('VG01', 'enable', 'ok'),
+        ('VG01', 'send_command', 'ok'), ('VG01', 'parse', 'ok'),
+        # Second operation reuses the pooled session: no connect/login/enable
+        ('VG01', 'send_config', 'ok'), ('VG01', 'save_config', 'ok'),
+        ('VG01', 'send_command', 'ok'), ('VG01', 'parse', 'ok'),
+    ]
+
+
+def test_sync_plan_contains_only_the_difference():
+    desired = parse_rule_csv("rule,match,replace\n1,^677250412,970202\n\n# moved\n3,^677250414,970204\n")
+    live = parse_translation_rules(RUNNING_CONFIG)[2]
+
+    assert plan_rule_sync(live, desired) == [
+        'no rule 2',
+        'rule 3 /^677250414/ /970204/ plan any unknown',
+    ]
+    assert plan_rule_sync(live, live) == []
+
+    # Digit-strip rules have an empty replacement
+    strip = parse_rule_csv("1,^0,\n2,^1,\n")
+    assert plan_rule_sync(parse_translation_rules(RUNNING_CONFIG)[255], strip) == []
+
+    for bad in ("1,^677", "x,^677,970", "1,^677,970\n1,^678,971", "1,^6/77,970", "1,,970",
+                "", "rule,match,replace\n", "# nothing\n"):
+        try:
+            parse_rule_csv(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+def test_sync_diversions_pushes_diff_in_one_session():
+    driver = CiscoVGDriver(FakeDevice())
+    desired = parse_rule_csv("1,^677250412,111\n2,^677250413,970203\n")
+
+    # Dry run: the live rules are read, nothing is configured
+    assert driver.sync_diversions(desired, dry_run=True) == ['rule 1 /^677250412/ /111/ plan any unknown']
+    assert FakeConnection.commands == ["show run | section voice translation-rule"]
+
+    try:
+        driver.sync_diversions([])
+        assert False, "an empty table must not clear the rule set"
+    except ValueError:
+        pass
+
+    FakeConnection.commands = []
+    commands = driver.sync_diversions(desired)
+    assert commands == ['rule 1 /^677250412/ /111/ plan any unknown']
+    assert FakeConnection.commands == [
+        "show run | section voice translation-rule",
+        'voice translation-rule 2', 'rule 1 /^677250412/ /111/ plan any unknown', 'exit', 'exit',
+        'write memory',
+        "show run | section voice translation-rule",
+    ]
+
+
+def test_open_breaker_fails_before_taking_a_pool_slot():
+    driver = CiscoVGDriver(FakeDevice())
+    for _ in range(device_breakers.failure_threshold):
+        try:
+            device_breakers.call(1, lambda: 1 / 0)
+        except ZeroDivisionError:
+            pass
+
+    submitted = []
+    device_executor.run = lambda fn, timeout=None: submitted.append(fn)
+    try:
+        driver.get_diversions(refresh=True)
+        assert False, "expected the open breaker to fail the read"
+    except Exception as e:
+        assert 'Device unreachable' in str(e)
+    finally:
+        del device_executor.run
+    assert submitted == []
+    assert FakeConnection.commands == []
+
+
+if __name__ == '__main__':
+    for test in (test_parses_only_rule_set_2, test_parser_indexes_every_rule_set,
+                 test_parses_show_translation_rule_output,
+                 test_any_rule_set_is_served_from_one_fetch, test_update_targets_selected_rule_set,
+                 test_reads_are_served_from_snapshot_cache,
+                 test_expired_snapshot_is_refetched, test_update_returns_post_change_rules_from_same_session,
+                 test_bulk_update_uses_one_context_and_one_save,
+                 test_update_by_source_matches_display_or_raw_pattern, test_concurrent_reads_share_one_fetch,
+                 test_operations_record_phase_timings, test_sync_plan_contains_only_the_difference,
+                 test_sync_diversions_pushes_diff_in_one_session,
+                 test_open_breaker_fails_before_taking_a_pool_slot):
+        setup_function(test)
+        test()
+        teardown_function(test)
+    print("All driver tests passed!")
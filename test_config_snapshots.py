@@ -0,0 +1,106 @@
+import sqlite3
+from flask import Flask
+from sqlalchemy import inspect
+from models import db, Device, ConfigSnapshot, upgrade_schema
+from services.rule_cache import RuleCache, RuleSnapshot
+
+
+def make_app(db_path):
+    test_app = Flask(__name__)
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(test_app)
+    return test_app
+
+
+def test_upgrade_schema_adds_new_tables_and_columns(tmp_path):
+    db_path = tmp_path / 'old.db'
+    # A device table as created before poll_interval existed
+    connection = sqlite3.connect(db_path)
+    connection.execute("""CREATE TABLE device (
+        id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(50), ip_address VARCHAR(50),
+        protocol VARCHAR(10), port INTEGER, username VARCHAR(50), password VARCHAR(50),
+        enable_password VARCHAR(50), permission_bit INTEGER)""")
+    connection.execute("INSERT INTO device (id, name) VALUES (1, 'VG01')")
+    connection.commit()
+    connection.close()
+
+    test_app = make_app(db_path)
+    with test_app.app_context():
+        upgrade_schema()
+        inspector = inspect(db.engine)
+        assert 'poll_interval' in {c['name'] for c in inspector.get_columns('device')}
+        assert 'config_snapshot' in inspector.get_table_names()
+        assert Device.query.get(1).name == 'VG01'
+
+        # Running it again is a no-op
+        upgrade_schema()
+
+
+def test_rule_snapshots_are_persisted_and_reloaded(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    cache = RuleCache()
+    cache.persisted_max_age = 900
+
+    with test_app.app_context():
+        upgrade_schema()
+        db.session.add(Device(id=1, name='VG01'))
+        db.session.commit()
+
+        rule_sets = {2: [{'id': '1', 'source': '677', 'destination': '970', 'raw_source': '^677'}]}
+        cache.put(1, rule_sets)
+        assert ConfigSnapshot.query.filter_by(device_id=1).one().rule_count() == 1
+
+        # A fresh process has nothing in memory and falls back to SQLite
+        cache.clear()
+        snapshot = cache.get(1)
+        assert snapshot is not None
+        assert snapshot.get_rules(2) == rule_sets[2]
+
+        cache.clear()
+        cache.persisted_max_age = 0
+        assert cache.get(1) is None
+
+
+def test_invalidated_snapshot_is_not_served_from_sqlite(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    cache = RuleCache()
+    cache.persisted_max_age = 900
+
+    with test_app.app_context():
+        upgrade_schema()
+        db.session.add(Device(id=1, name='VG01'))
+        db.session.commit()
+
+        cache.put(1, {2: [{'id': '1', 'source': '677', 'destination': '970', 'raw_source': '^677'}]})
+        # After a write the persisted pre-write rules must not answer reads
+        cache.invalidate(1)
+        assert cache.get(1) is None
+        # They still give the routing simulator an (aged) answer
+        assert cache.latest(1).get_rules(2)[0]['destination'] == '970'
+
+        # The next live read is served again
+        cache.put(1, {2: []})
+        cache.clear()
+        assert cache.get(1).get_rules(2) == []
+
+
+def test_snapshot_digest_tracks_rule_set_content():
+    rules = [{'id': '1', 'source': '677', 'destination': '970', 'raw_source': '^677'}]
+    first = RuleSnapshot({2: rules, 255: []})
+    # Re-reading the same rules later gives the same ETag
+    assert RuleSnapshot({2: [dict(rules[0])]}).digest(2) == first.digest(2)
+    assert first.digest(2) != first.digest(255)
+
+    changed = RuleSnapshot({2: [dict(rules[0], destination='971')]})
+    assert changed.digest(2) != first.digest(2)
+
+
+if __name__ == '__main__':
+    import tempfile
+    import pathlib
+    test_upgrade_schema_adds_new_tables_and_columns(pathlib.Path(tempfile.mkdtemp()))
+    test_rule_snapshots_are_persisted_and_reloaded(pathlib.Path(tempfile.mkdtemp()))
+    test_invalidated_snapshot_is_not_served_from_sqlite(pathlib.Path(tempfile.mkdtemp()))
+    test_snapshot_digest_tracks_rule_set_content()
+    print("All config snapshot tests passed!")
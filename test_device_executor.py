@@ -0,0 +1,62 @@
+import threading
+from services.device_executor import DeviceExecutor, DeviceBusyError, DeviceTimeoutError
+
+
+def make_executor(workers, max_queue):
+    executor = DeviceExecutor()
+    executor.workers = workers
+    executor.max_queue = max_queue
+    executor.timeout = 5
+    return executor
+
+
+def test_full_queue_fails_fast():
+    executor = make_executor(workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+    try:
+        executor.submit(release.wait)
+        assert False, "expected DeviceBusyError"
+    except DeviceBusyError:
+        pass
+    assert executor.pending() == 2
+
+    release.set()
+    running.result()
+    queued.result()
+    assert executor.pending() == 0
+    assert executor.run(lambda: 'ok') == 'ok'
+
+
+def test_caller_stops_waiting_after_timeout():
+    executor = make_executor(workers=1, max_queue=0)
+    release = threading.Event()
+
+    try:
+        executor.run(release.wait, timeout=0.1)
+        assert False, "expected DeviceTimeoutError"
+    except DeviceTimeoutError:
+        pass
+    release.set()
+
+
+def test_errors_propagate_to_caller():
+    executor = make_executor(workers=1, max_queue=0)
+
+    def failing():
+        raise OSError("Socket is closed")
+
+    try:
+        executor.run(failing)
+        assert False, "expected OSError"
+    except OSError as e:
+        assert str(e) == "Socket is closed"
+
+
+if __name__ == '__main__':
+    test_full_queue_fails_fast()
+    test_caller_stops_waiting_after_timeout()
+    test_errors_propagate_to_caller()
+    print("All device executor tests passed!")
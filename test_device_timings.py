@@ -0,0 +1,42 @@
+from flask import Flask
+from services.device_timings import DeviceTimings, percentile
+
+
+def test_percentiles_per_device_and_phase():
+    timings = DeviceTimings()
+    for ms in range(1, 101):
+        timings.record('VG01', 'send_command', ms / 1000)
+    timings.record('VG01', 'login', 0.5, 'error')
+    timings.record('VG02', 'send_command', 0.2)
+
+    rows = {(row['device'], row['phase']): row for row in timings.summary()}
+    command = rows[('VG01', 'send_command')]
+    assert command['count'] == 100
+    assert round(command['p50']) == 50
+    assert round(command['p95']) == 95
+    assert round(command['p99']) == 99
+    assert rows[('VG01', 'login')]['errors'] == 1
+    assert rows[('VG02', 'send_command')]['p99'] == 200
+    assert percentile([], 0.5) is None
+
+
+def test_ring_buffer_keeps_latest_spans_and_tags_errors():
+    app = Flask(__name__)
+    app.config['DEVICE_TIMING_BUFFER'] = 3
+    timings = DeviceTimings(app)
+    for phase in ('connect', 'login', 'enable', 'send_command'):
+        timings.record('VG01', phase, 0.01)
+    assert [span.phase for span in timings.spans()] == ['login', 'enable', 'send_command']
+
+    try:
+        with timings.span('VG01', 'save_config'):
+            raise OSError("write memory timed out")
+    except OSError:
+        pass
+    assert timings.spans()[-1].outcome == 'error'
+
+
+if __name__ == '__main__':
+    test_percentiles_per_device_and_phase()
+    test_ring_buffer_keeps_latest_spans_and_tags_errors()
+    print("All device timing tests passed!")
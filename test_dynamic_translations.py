@@ -1,7 +1,9 @@
 from app import app
+from models import upgrade_schema
 from services.translation_service import translation_service
 
 with app.app_context():
+    upgrade_schema()
     print('Testing dynamic translations:')
 
     # Test user translations
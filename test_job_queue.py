@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device, User, AuditLog, ConfigJob, upgrade_schema
+from services import job_queue as job_queue_module
+from services.device_executor import DeviceBusyError
+from services.job_queue import JobQueue
+
+RealDriver = job_queue_module.CiscoVGDriver
+
+
+class FakeDriver:
+    """Stands in for CiscoVGDriver and records the order changes are applied in"""
+    applied = []
+    attempts = 0
+    busy_until = 0
+    active = {}
+    overlap = False
+    lock = threading.Lock()
+
+    def __init__(self, device):
+        self.device_id = device.id
+
+    def update_diversions(self, changes, rule_set):
+        with FakeDriver.lock:
+            FakeDriver.attempts += 1
+            if time.monotonic() < FakeDriver.busy_until:
+                raise DeviceBusyError("All device workers are busy, please retry in a few seconds")
+            if FakeDriver.active.get(self.device_id):
+                FakeDriver.overlap = True
+            FakeDriver.active[self.device_id] = True
+        time.sleep(0.05)
+        with FakeDriver.lock:
+            FakeDriver.active[self.device_id] = False
+            FakeDriver.applied.append((self.device_id, changes[0]['new_destination']))
+        if changes[0]['new_destination'] == 'fail':
+            raise Exception("Configuration Error: % Invalid input")
+
+
+def make_queue(db_path, **config):
+    test_app = Flask(__name__)
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    test_app.config['JOB_QUEUE_ENABLED'] = True
+    test_app.config['JOB_QUEUE_POLL_INTERVAL'] = 0.05
+    test_app.config.update(config)
+    db.init_app(test_app)
+    with test_app.app_context():
+        upgrade_schema()
+        db.session.add(User(id=1, username='admin', password_hash='x'))
+        db.session.add(Device(id=1, name='VG01'))
+        db.session.add(Device(id=2, name='VG02'))
+        db.session.commit()
+    return test_app, JobQueue(test_app)
+
+
+class RecordingHandler(logging.Handler):
+    """Collects the job queue's warnings"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+        logging.getLogger(job_queue_module.__name__).addHandler(self)
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def close(self):
+        logging.getLogger(job_queue_module.__name__).removeHandler(self)
+        super().close()
+
+
+def wait_for_jobs(test_app, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with test_app.app_context():
+            if ConfigJob.query.filter(ConfigJob.status.in_([ConfigJob.DONE, ConfigJob.FAILED])).count() == count:
+                return
+        time.sleep(0.05)
+    assert False, "jobs did not finish in time"
+
+
+def setup_function():
+    FakeDriver.applied, FakeDriver.active, FakeDriver.overlap = [], {}, False
+    FakeDriver.attempts, FakeDriver.busy_until = 0, 0
+    job_queue_module.CiscoVGDriver = FakeDriver
+
+
+def teardown_function():
+    job_queue_module.CiscoVGDriver = RealDriver
+
+
+def change(dest):
+    return [{'rule_id': '1', 'raw_source': '^677', 'new_destination': dest}]
+
+
+def test_jobs_run_in_fifo_order_per_device(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db')
+    warnings = RecordingHandler()
+
+    with test_app.app_context():
+        for dest in ('101', '102', '103'):
+            queue.submit(1, 1, 2, change(dest))
+        job = queue.submit(2, 1, 2, change('201'))
+        assert job.status == ConfigJob.QUEUED
+
+    wait_for_jobs(test_app, 4)
+    assert [dest for device, dest in FakeDriver.applied if device == 1] == ['101', '102', '103']
+    assert (2, '201') in FakeDriver.applied
+    assert not FakeDriver.overlap
+    # Fresh jobs are not mistaken for jobs taken over from a dead worker
+    warnings.close()
+    assert warnings.messages == []
+
+    with test_app.app_context():
+        assert AuditLog.query.filter_by(action="Change Diversion").count() == 4
+
+
+def test_failed_job_keeps_error_and_later_jobs_still_run(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db')
+
+    with test_app.app_context():
+        failing = queue.submit(1, 1, 2, change('fail')).id
+        queue.submit(1, 1, 2, change('104'))
+
+    wait_for_jobs(test_app, 2)
+    with test_app.app_context():
+        job = ConfigJob.query.get(failing)
+        assert job.status == ConfigJob.FAILED
+        assert 'Invalid input' in job.to_dict()['error']
+        assert [j.status for j in ConfigJob.query.order_by(ConfigJob.id)] == [ConfigJob.FAILED, ConfigJob.DONE]
+
+
+def test_busy_device_pool_is_retried_after_backoff(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db', JOB_QUEUE_BUSY_BACKOFF=0.3)
+    FakeDriver.busy_until = time.monotonic() + 1
+
+    with test_app.app_context():
+        queue.submit(1, 1, 2, change('105'))
+        queue.submit(1, 1, 2, change('106'))
+
+    wait_for_jobs(test_app, 2)
+    # About one attempt per backoff while busy, not a tight claim/requeue loop
+    assert FakeDriver.attempts <= 8
+    # The busy job kept its place at the head of the device's queue
+    assert FakeDriver.applied == [(1, '105'), (1, '106')]
+
+
+def test_two_workers_share_the_queue_without_running_a_job_twice(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db')
+    # A second worker process on the same database, with its own owner token
+    other = JobQueue(test_app)
+
+    with test_app.app_context():
+        for dest in ('101', '102', '103', '104'):
+            queue.submit(1, 1, 2, change(dest))
+        queue.submit(2, 1, 2, change('201'))
+    other.start()
+
+    wait_for_jobs(test_app, 5)
+    assert sorted(FakeDriver.applied) == [(1, '101'), (1, '102'), (1, '103'), (1, '104'), (2, '201')]
+    assert [dest for device, dest in FakeDriver.applied if device == 1] == ['101', '102', '103', '104']
+    assert not FakeDriver.overlap
+
+
+def test_running_job_is_recovered_only_when_its_lease_expired(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db')
+
+    with test_app.app_context():
+        for device_id, leased_until in ((1, datetime.utcnow() + timedelta(minutes=5)),
+                                        (2, datetime.utcnow() - timedelta(minutes=5))):
+            job = ConfigJob(device_id=device_id, user_id=1, rule_set=2, status=ConfigJob.RUNNING,
+                            owner='other-host:1:dead', leased_until=leased_until)
+            job.set_changes(change(str(device_id)))
+            db.session.add(job)
+        db.session.commit()
+    queue.start()
+
+    wait_for_jobs(test_app, 1)
+    time.sleep(0.2)
+    # The live claim is left alone, the expired one is taken over
+    assert FakeDriver.applied == [(2, '2')]
+    with test_app.app_context():
+        live = ConfigJob.query.filter_by(device_id=1).one()
+        assert live.status == ConfigJob.RUNNING and live.owner == 'other-host:1:dead'
+
+
+def test_crashed_job_is_marked_failed(tmp_path):
+    test_app, queue = make_queue(tmp_path / 'app.db')
+
+    with test_app.app_context():
+        # Unreadable changes fail before the device is touched
+        job = ConfigJob(device_id=1, user_id=1, rule_set=2, changes_json='not json')
+        db.session.add(job)
+        db.session.commit()
+        crashing = job.id
+        queue.submit(1, 1, 2, change('108'))
+
+    wait_for_jobs(test_app, 2)
+    assert FakeDriver.applied == [(1, '108')]
+    with test_app.app_context():
+        job = ConfigJob.query.get(crashing)
+        assert job.status == ConfigJob.FAILED
+        assert job.error.startswith('Job crashed')
+        assert job.owner == queue.owner and job.finished_at is not None
+
+
+if __name__ == '__main__':
+    import tempfile
+    import pathlib
+    for test in (test_jobs_run_in_fifo_order_per_device, test_failed_job_keeps_error_and_later_jobs_still_run,
+                 test_busy_device_pool_is_retried_after_backoff,
+                 test_two_workers_share_the_queue_without_running_a_job_twice,
+                 test_running_job_is_recovered_only_when_its_lease_expired,
+                 test_crashed_job_is_marked_failed):
+        setup_function()
+        test(pathlib.Path(tempfile.mkdtemp()))
+        teardown_function()
+    print("All job queue tests passed!")
@@ -0,0 +1,60 @@
+import time
+from types import SimpleNamespace
+from services.number_router import NumberRouter, RuleMatcher
+from services.rule_cache import RuleSnapshot
+
+
+def rule(rule_id, raw_source, destination):
+    return {'id': str(rule_id), 'source': raw_source.replace('^', ''),
+            'destination': destination, 'raw_source': raw_source}
+
+
+RULES = [
+    rule(1, '^677250412', '970202'),
+    rule(2, '^6772504', '970000'),
+    rule(3, '^9\\(.*\\)', '\\1'),
+    rule(10, '^677', '111'),
+    rule(4, '^.*5$', '555'),
+]
+
+
+def test_first_matching_rule_wins():
+    matcher = RuleMatcher(RULES)
+
+    # Literal prefixes: the lowest rule number wins, not the longest prefix
+    assert matcher.match('6772504123') == (RULES[0], '9702023')
+    assert matcher.match('6772504999')[0]['id'] == '2'
+    # A regex rule numbered before the literal match takes precedence
+    assert matcher.match('6779995')[0]['id'] == '4'
+    assert matcher.match('6779990') == (RULES[3], '1119990')
+    # Cisco's escaped-parenthesis groups and back references
+    assert matcher.match('90677') == (RULES[2], '0677')
+    assert matcher.match('123') is None
+
+
+def test_bulk_lookup_across_cached_devices():
+    router = NumberRouter()
+    devices = [SimpleNamespace(id=1, name='VG01'), SimpleNamespace(id=2, name='VG02'),
+               SimpleNamespace(id=3, name='VG03')]
+    snapshots = {1: RuleSnapshot({2: RULES}), 2: RuleSnapshot({2: [rule(1, '^6', '7')]}), 3: None}
+
+    routes = router.route(devices, ['6772504123', '123'], 2, snapshots)
+    assert [(r.device, r.result) for r in routes['6772504123']] == [('VG01', '9702023'), ('VG02', '7772504123')]
+    assert [(r.device, r.rule, r.result) for r in routes['123']] == [('VG01', None, '123'), ('VG02', None, '123')]
+
+    # Matchers are compiled once per snapshot
+    assert router.matcher(1, 2, snapshots[1]) is router.matcher(1, 2, snapshots[1])
+
+    # Thousands of rules still answer in microseconds per number
+    big = [rule(i, f'^6772{i:06d}', f'970{i:06d}') for i in range(1, 5001)]
+    matcher = RuleMatcher(big)
+    started = time.perf_counter()
+    for i in range(1, 5001):
+        assert matcher.match(f'6772{i:06d}')[0]['id'] == str(i)
+    assert (time.perf_counter() - started) / 5000 < 0.0005
+
+
+if __name__ == '__main__':
+    test_first_matching_rule_wins()
+    test_bulk_lookup_across_cached_devices()
+    print("All number router tests passed!")
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+import time
+from services.save_scheduler import SaveScheduler
+
+
+def make_scheduler(quiet_period, max_delay):
+    scheduler = SaveScheduler()
+    scheduler.enabled = True
+    scheduler.quiet_period = quiet_period
+    scheduler.max_delay = max_delay
+    return scheduler
+
+
+def test_changes_within_quiet_period_share_one_save():
+    scheduler = make_scheduler(quiet_period=0.2, max_delay=5)
+    saves = []
+
+    for _ in range(5):
+        scheduler.schedule(1, lambda: saves.append(1))
+        time.sleep(0.05)
+
+    assert scheduler.pending(1) is not None
+    time.sleep(0.4)
+
+    assert saves == [1]
+    assert scheduler.pending(1) is None
+
+
+def test_max_delay_forces_save_during_constant_changes():
+    scheduler = make_scheduler(quiet_period=0.2, max_delay=0.3)
+    saves = []
+
+    deadline = time.monotonic() + 0.6
+    while time.monotonic() < deadline:
+        scheduler.schedule(1, lambda: saves.append(1))
+        time.sleep(0.05)
+
+    assert len(saves) >= 1
+
+
+def test_flush_all_saves_pending_devices():
+    scheduler = make_scheduler(quiet_period=60, max_delay=60)
+    saves = []
+
+    scheduler.schedule(1, lambda: saves.append(1))
+    scheduler.schedule(2, lambda: saves.append(2))
+    scheduler.flush_all()
+
+    assert sorted(saves) == [1, 2]
+    assert scheduler.pending(1) is None and scheduler.pending(2) is None
+
+
+def test_failed_save_stays_pending():
+    scheduler = make_scheduler(quiet_period=60, max_delay=60)
+
+    def failing_save():
+        raise OSError("Socket is closed")
+
+    scheduler.schedule(1, failing_save)
+    scheduler.flush(1)
+
+    assert scheduler.pending(1)['last_error'] == "Socket is closed"
+
+
+def test_pending_saves_are_flushed_at_interpreter_exit():
+    # The atexit flush runs after concurrent.futures stopped taking work, so the
+    # save must not depend on submitting to the device pool
+    script = """
+from services.device_executor import DeviceExecutor
+from services.save_scheduler import SaveScheduler
+from flask import Flask
+
+executor = DeviceExecutor()
+executor.run(lambda: None)
+scheduler = SaveScheduler()
+scheduler.init_app(Flask(__name__))
+scheduler.enabled = True
+scheduler.quiet_period = scheduler.max_delay = 60
+scheduler.schedule(1, lambda: executor.run(lambda: print('saved', flush=True)))
+"""
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=30)
+    assert result.stdout.strip() == 'saved', result.stderr
+    assert 'failed' not in result.stderr
+
+
+if __name__ == '__main__':
+    test_changes_within_quiet_period_share_one_save()
+    test_max_delay_forces_save_during_constant_changes()
+    test_flush_all_saves_pending_devices()
+    test_failed_save_stays_pending()
+    test_pending_saves_are_flushed_at_interpreter_exit()
+    print("All save scheduler tests passed!")
@@ -0,0 +1,91 @@
+import services.session_pool as session_pool_module
+from services.session_pool import SessionPool, ConnectHandler
+
+
+class FakeConnection:
+    """Stand-in for a netmiko connection that counts logins"""
+    logins = 0
+
+    def __init__(self, **params):
+        FakeConnection.logins += 1
+        self.alive = True
+        self.closed = False
+
+    def _open(self):
+        self.telnet_login()
+
+    def telnet_login(self):
+        pass
+
+    def enable(self):
+        pass
+
+    def check_enable_mode(self):
+        return True
+
+    def is_alive(self):
+        return self.alive
+
+    def send_command(self, command):
+        if not self.alive:
+            raise OSError("Socket is closed")
+        return "voice translation-rule 2"
+
+    def disconnect(self):
+        self.closed = True
+
+
+def make_pool():
+    session_pool_module.ConnectHandler = FakeConnection
+    FakeConnection.logins = 0
+    pool = SessionPool()
+    pool.reap_interval = 3600
+    return pool
+
+
+def teardown_function(function):
+    session_pool_module.ConnectHandler = ConnectHandler
+
+
+def test_session_reused_between_calls():
+    pool = make_pool()
+    params = {'host': '10.0.0.1'}
+
+    for _ in range(3):
+        output = pool.run(1, params, lambda c: c.send_command("show run"))
+        assert output == "voice translation-rule 2"
+
+    assert FakeConnection.logins == 1
+
+
+def test_dead_session_reconnects():
+    pool = make_pool()
+    params = {'host': '10.0.0.1'}
+
+    pool.run(1, params, lambda c: c.send_command("show run"))
+    pool._sessions[1].connection.alive = False
+    pool.run(1, params, lambda c: c.send_command("show run"))
+
+    assert FakeConnection.logins == 2
+
+
+def test_changed_params_and_idle_timeout_reconnect():
+    pool = make_pool()
+
+    pool.run(1, {'host': '10.0.0.1'}, lambda c: None)
+    pool.run(1, {'host': '10.0.0.9'}, lambda c: None)
+    assert FakeConnection.logins == 2
+
+    pool.idle_timeout = 0
+    first = pool._sessions[1].connection
+    pool._sessions[1].last_used -= 1
+    pool.reap_idle()
+    assert first.closed
+    assert pool._sessions[1].connection is None
+
+
+if __name__ == '__main__':
+    test_session_reused_between_calls()
+    test_dead_session_reconnects()
+    test_changed_params_and_idle_timeout_reconnect()
+    print("All session pool tests passed!")
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from services.timing_profiles import TimingProfiles, FAST, STANDARD, SLOW
+
+
+def make_device(**overrides):
+    fields = dict(id=1, fast_cli=None, delay_factor=None, read_timeout=None, timing_profile=None)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def make_profiles():
+    profiles = TimingProfiles()
+    profiles.min_samples = 3
+    return profiles
+
+
+def test_fast_gateway_is_promoted_and_slow_one_demoted():
+    profiles = make_profiles()
+    device = make_device()
+    assert profiles.connection_params(device)['fast_cli'] is False
+
+    for _ in range(3):
+        profiles.observe(1, 0.3)
+    assert profiles.profile(device) == FAST
+    assert profiles.connection_params(device)['fast_cli'] is True
+
+    slow = make_device(id=2)
+    for _ in range(3):
+        profiles.observe(2, 8.0)
+    assert profiles.profile(slow) == SLOW
+    assert profiles.connection_params(slow)['global_delay_factor'] == 2
+
+
+def test_failures_step_back_and_overrides_win():
+    profiles = make_profiles()
+    device = make_device(timing_profile=FAST)
+    # Learned profile from the database is used until new samples arrive
+    assert profiles.profile(device) == FAST
+
+    profiles.record_failure(1)
+    assert profiles.profile(device) == STANDARD
+    profiles.record_failure(1)
+    assert profiles.profile(device) == SLOW
+
+    pinned = make_device(fast_cli=True, delay_factor=0.5, read_timeout=30)
+    params = profiles.connection_params(pinned)
+    assert params == {'fast_cli': True, 'global_delay_factor': 0.5, 'read_timeout_override': 30}
+
+
+if __name__ == '__main__':
+    test_fast_gateway_is_promoted_and_slow_one_demoted()
+    test_failures_step_back_and_overrides_win()
+    print("All timing profile tests passed!")
@@ -0,0 +1,251 @@
+import threading
+import time
+from flask import Flask, g, render_template, render_template_string
+from jinja2 import DictLoader
+from sqlalchemy import event
+from models import db, Language, Translation
+from services.translation_service import TranslationService, TranslatingEnvironment
+
+
+def make_app(db_path):
+    test_app = Flask(__name__)
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    test_app.config['SECRET_KEY'] = 'test'
+    db.init_app(test_app)
+    with test_app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Language(code='en-US', name='English (US)'),
+            Language(code='it-IT', name='Italian (IT)'),
+            Language(code='de-DE', name='German', is_active=False),
+            Translation(key='login.title', language_code='en-US', value='Login'),
+            Translation(key='login.title', language_code='it-IT', value='Accesso'),
+            Translation(key='login.only_en', language_code='en-US', value='English only'),
+            Translation(key='login.title', language_code='de-DE', value='Anmeldung'),
+            Translation(key='users.edit', language_code='en-US', value='Edit {username} ({role})'),
+            Translation(key='users.edit', language_code='it-IT', value='Modifica {username}'),
+        ])
+        db.session.commit()
+    return test_app
+
+
+def count_queries(test_app):
+    statements = []
+    with test_app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_catalogs_load_in_one_query_with_fallbacks(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    service = TranslationService()
+    statements = count_queries(test_app)
+
+    with test_app.app_context():
+        catalogs = service.load_catalogs()
+        assert len(statements) == 1
+
+        assert set(catalogs) == {'en-US', 'it-IT'}
+        assert service.get_translation('login.title', 'it-IT') == 'Accesso'
+        # Fallback chain resolved at load time
+        assert catalogs['it-IT']['login.only_en'] == 'English only'
+        # Inactive or unknown languages get the default catalog
+        assert service.get_translation('login.title', 'de-DE') == 'Login'
+        assert service.get_translation('missing.key', 'it-IT') == 'missing.key'
+
+        try:
+            catalogs['en-US']['login.title'] = 'changed'
+            assert False, "catalogs must be read-only"
+        except TypeError:
+            pass
+
+
+def test_render_issues_no_translation_sql(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    service = TranslationService(test_app)
+    statements = count_queries(test_app)
+    template = "{% for i in range(30) %}{{ get_translation('login.title') }}{{ get_translation('login.only_en') }}{% endfor %}"
+
+    with test_app.test_request_context('/'):
+        g.current_language = 'it-IT'
+        render_template_string(template)
+        loads = len(statements)
+        html = render_template_string(template)
+
+    assert loads == 1
+    assert len(statements) == loads
+    assert html.count('Accesso') == 30 and html.count('English only') == 30
+
+
+def test_mixed_language_load_shares_one_cache(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    service = TranslationService(test_app)
+    expected = {'en-US': 'Login', 'it-IT': 'Accesso', 'fr-FR': 'Login'}
+    lookups = 2000
+    start = threading.Barrier(9)
+    errors = []
+
+    def user(language_code, switch_to=None):
+        with test_app.test_request_context('/'):
+            g.current_language = language_code
+            start.wait()
+            for i in range(lookups):
+                if switch_to and i == lookups // 2:
+                    # One user switching language must not affect anyone else
+                    service.set_language(switch_to)
+                    language_code = switch_to
+                value = service.get_translation('login.title')
+                if value != expected[language_code] or service.get_translation('login.only_en') != 'English only':
+                    errors.append((language_code, value))
+
+    threads = [threading.Thread(target=user, args=(language_code,))
+               for language_code in ('en-US', 'it-IT', 'fr-FR') * 2]
+    threads += [threading.Thread(target=user, args=('en-US', 'it-IT')),
+                threading.Thread(target=user, args=('it-IT', 'en-US'))]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    for thread in threads:
+        thread.join()
+
+    total = len(threads) * lookups * 2
+    assert errors == []
+    # One cold load shared by every thread; every other lookup was a hit
+    assert service.loads == 1
+    assert (total - service.loads) / total > 0.9999
+
+
+def test_version_stamp_reloads_only_changed_languages_in_other_processes(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    # Two services on one database stand in for two worker processes
+    editor, worker = TranslationService(), TranslationService()
+    worker.version_check_interval = 60
+
+    with test_app.app_context():
+        editor.load_catalogs()
+        worker.load_catalogs()
+        english = worker.get_catalog('en-US')
+
+        translation = Translation.query.filter_by(key='login.title', language_code='it-IT').first()
+        translation.value = 'Entra'
+        db.session.commit()
+        editor.bump_versions('it-IT')
+        assert editor.get_translation('login.title', 'it-IT') == 'Entra'
+
+        # Within the check interval the worker keeps its catalogs without querying
+        worker._checked_at = time.monotonic()
+        assert worker.check_versions() == []
+        assert worker.get_translation('login.title', 'it-IT') == 'Accesso'
+
+        # Once due, only the changed language is reloaded
+        worker._checked_at -= 60
+        assert worker.check_versions() == ['it-IT']
+        assert worker.get_translation('login.title', 'it-IT') == 'Entra'
+        assert worker.get_catalog('en-US') is english
+        assert worker.check_versions(force=True) == []
+
+        # A change to the fallback language reaches the languages built on it
+        db.session.add(Translation(key='login.new', language_code='en-US', value='New'))
+        db.session.commit()
+        editor.bump_versions('en-US')
+        assert worker.check_versions(force=True) == ['en-US', 'it-IT']
+        assert worker.get_translation('login.new', 'it-IT') == 'New'
+
+
+def test_parameterized_messages_compiled_with_catalog(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    service = TranslationService()
+    reports = []
+    service.param_hook = lambda key, language_code, missing, extra: reports.append((key, language_code, missing, extra))
+
+    with test_app.app_context():
+        service.load_catalogs()
+        template = service._messages['en-US']['users.edit']
+        assert template.parts == ('Edit ', 'username', ' (', 'role', ')')
+        # Values without placeholders need no template
+        assert 'login.title' not in service._messages['en-US']
+
+        params = {'username': 'admin', 'role': 'ops'}
+        assert service.get_translation_with_params('users.edit', params, 'en-US') == 'Edit admin (ops)'
+        assert reports == []
+
+        # Parameters that do not fit are rendered as before but reported
+        assert service.get_translation_with_params('users.edit', params, 'it-IT') == 'Modifica admin'
+        assert service.get_translation_with_params('users.edit', {'username': 'x'}, 'fr-FR') == 'Edit x ({role})'
+        assert service.get_translation_with_params('login.title', {'x': 1}, 'en-US') == 'Login'
+        assert service.get_translation_with_params('missing.key', {'x': 1}, 'en-US') == 'missing.key'
+        assert reports == [
+            ('users.edit', 'it-IT', set(), {'role'}),
+            ('users.edit', 'fr-FR', {'role'}, set()),
+            ('login.title', 'en-US', set(), {'x'}),
+        ]
+
+
+def test_constant_keys_are_inlined_per_language(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    test_app.jinja_environment = TranslatingEnvironment
+    test_app.jinja_options = {'loader': DictLoader({
+        'base.html': "{% block body %}{% endblock %}|{{ get_translation('login.only_en') }}",
+        'page.html': "{% extends 'base.html' %}{% block body %}<b>{{ get_translation('login.title') }}</b>"
+                     "{{ get_translation('login.' ~ name) }}{% endblock %}",
+    })}
+    service = TranslationService(test_app)
+    calls = []
+    lookup = service.get_translation
+    service.get_translation = lambda key, language_code=None: calls.append(key) or lookup(key, language_code)
+
+    def render(language_code):
+        with test_app.test_request_context('/'):
+            g.current_language = language_code
+            return render_template('page.html', name='title')
+
+    assert render('en-US') == '<b>Login</b>Login|English only'
+    assert render('it-IT') == '<b>Accesso</b>Accesso|English only'
+    # Only the computed key was looked up at render time
+    assert calls == ['login.title', 'login.title']
+
+    environment = test_app.jinja_env
+    with test_app.app_context():
+        english = environment.for_language('en-US').get_template('page.html')
+        italian = environment.for_language('it-IT').get_template('page.html')
+        assert english is not italian
+        assert environment.for_language('en-US').get_template('page.html') is english
+
+        # A new catalog version recompiles that language only
+        translation = Translation.query.filter_by(key='login.title', language_code='it-IT').first()
+        translation.value = 'Entra <ora>'
+        db.session.commit()
+        service.bump_versions('it-IT')
+        assert environment.for_language('it-IT').get_template('page.html') is not italian
+        assert environment.for_language('en-US').get_template('page.html') is english
+    assert render('it-IT') == '<b>Entra &lt;ora&gt;</b>Entra &lt;ora&gt;|English only'
+
+
+def test_languages_without_catalog_share_one_overlay(tmp_path):
+    test_app = make_app(tmp_path / 'app.db')
+    test_app.jinja_environment = TranslatingEnvironment
+    test_app.jinja_options = {'loader': DictLoader({'page.html': "{{ get_translation('login.title') }}"})}
+    service = TranslationService(test_app)
+    with test_app.app_context():
+        Translation.query.delete()
+        db.session.commit()
+
+        environment = test_app.jinja_env
+        page = environment.for_language('fr-FR').get_template('page.html')
+        # No catalog at all: the same empty catalog, so the compiled template is reused
+        assert service.get_catalog('fr-FR') is service.get_catalog('es-ES')
+        assert environment.for_language('fr-FR').get_template('page.html') is page
+
+
+if __name__ == '__main__':
+    import tempfile
+    import pathlib
+    test_catalogs_load_in_one_query_with_fallbacks(pathlib.Path(tempfile.mkdtemp()))
+    test_render_issues_no_translation_sql(pathlib.Path(tempfile.mkdtemp()))
+    test_mixed_language_load_shares_one_cache(pathlib.Path(tempfile.mkdtemp()))
+    test_version_stamp_reloads_only_changed_languages_in_other_processes(pathlib.Path(tempfile.mkdtemp()))
+    test_parameterized_messages_compiled_with_catalog(pathlib.Path(tempfile.mkdtemp()))
+    test_constant_keys_are_inlined_per_language(pathlib.Path(tempfile.mkdtemp()))
+    test_languages_without_catalog_share_one_overlay(pathlib.Path(tempfile.mkdtemp()))
+    print("All translation catalog tests passed!")
@@ -1,7 +1,9 @@
 from app import app
+from models import upgrade_schema
 from services.translation_service import translation_service
 
 with app.app_context():
+    upgrade_schema()
     print('Translation test:')
     print('Login title:', translation_service.get_translation('login.title'))
     print('Admin users title:', translation_service.get_translation('admin.users.title'))
@@ -0,0 +1,100 @@
+import os
+import sys
+from types import SimpleNamespace
+from services.session_pool import session_pool
+from services.rule_cache import rule_cache
+from services.circuit_breaker import device_breakers
+import cisco_driver
+from cisco_driver import CiscoVGDriver
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from vg_simulator import VGSimulator
+
+DEVICE_ID = 901
+
+
+def make_driver(simulator, fetch_strategy=None):
+    host, port = simulator.address
+    return CiscoVGDriver(SimpleNamespace(
+        id=DEVICE_ID, name='SIM', ip_address=host, port=port, username='cisco',
+        password='cisco', enable_password='cisco', conn_timeout=5, read_timeout=5,
+        fast_cli=None, delay_factor=None, timing_profile=None, fetch_strategy=fetch_strategy,
+    ))
+
+
+def setup_function(function):
+    session_pool.discard(DEVICE_ID)
+    rule_cache.invalidate(DEVICE_ID)
+    device_breakers.reset(DEVICE_ID)
+    cisco_driver._unsupported.clear()
+
+
+def teardown_function(function):
+    session_pool.discard(DEVICE_ID)
+
+
+def test_driver_reads_and_updates_simulated_gateway():
+    with VGSimulator(rule_sets=(2, 255), rules_per_set=3) as simulator:
+        driver = make_driver(simulator)
+        rules = driver.get_diversions(refresh=True)
+        assert [rule['id'] for rule in rules] == ['1', '2', '3']
+        assert driver.get_diversions(rule_set=255, refresh=True)[0]['raw_source'] == '^677250400001'
+
+        snapshot = driver.update_diversion('2', '^677250400002', '555')
+        assert snapshot.get_rules(2)[1]['destination'] == '555'
+        # 'write memory' reached the startup config
+        assert simulator.gateway.saved[2][2] == '/^677250400002/ /555/ plan any unknown'
+        # One login served all three operations
+        assert simulator.stats['logins'] == 1
+
+
+def test_dropped_session_surfaces_as_connection_error():
+    with VGSimulator(fail_rate=1.0) as simulator:
+        driver = make_driver(simulator)
+        try:
+            driver.get_diversions(refresh=True)
+            raised = None
+        except Exception as e:
+            raised = e
+        assert raised is not None and 'Connection Error' in str(raised)
+        assert simulator.stats['dropped'] >= 1
+
+
+def test_targeted_fetch_reads_one_rule_set():
+    with VGSimulator(rule_sets=(1, 2, 255), rules_per_set=3) as simulator:
+        full = make_driver(simulator).get_diversions(rule_set=255, refresh=True)
+        rule_cache.invalidate(DEVICE_ID)
+
+        driver = make_driver(simulator, fetch_strategy='show')
+        assert driver.get_diversions(rule_set=255, refresh=True) == full
+        assert list(rule_cache.get(DEVICE_ID).rule_sets) == [255]
+
+        # A second rule set is merged into the cached snapshot
+        driver.get_diversions(rule_set=2)
+        assert sorted(rule_cache.get(DEVICE_ID).rule_sets) == [2, 255]
+
+        # ...but not into an expired one, whose rule sets would then pass for fresh
+        rule_cache.get(DEVICE_ID).fetched_at -= rule_cache.ttl + 2
+        driver.get_diversions(rule_set=1)
+        assert list(rule_cache.get(DEVICE_ID).rule_sets) == [1]
+
+
+def test_targeted_fetch_falls_back_when_command_is_rejected():
+    with VGSimulator(rule_sets=(2, 255), rules_per_set=3, reject_commands=['show voice']) as simulator:
+        driver = make_driver(simulator, fetch_strategy='show')
+        rules = driver.get_diversions(rule_set=255, refresh=True)
+        assert [rule['id'] for rule in rules] == ['1', '2', '3']
+        assert (DEVICE_ID, 'show') in cisco_driver._unsupported
+        cisco_driver.forget_unsupported(DEVICE_ID)
+        assert (DEVICE_ID, 'show') not in cisco_driver._unsupported
+        # The stricter section regex still returned only rule set 255
+        assert list(rule_cache.get(DEVICE_ID).rule_sets) == [255]
+
+
+if __name__ == '__main__':
+    for test in (test_driver_reads_and_updates_simulated_gateway,
+                 test_dropped_session_surfaces_as_connection_error, test_targeted_fetch_reads_one_rule_set,
+                 test_targeted_fetch_falls_back_when_command_is_rejected):
+        setup_function(test)
+        test()
+        teardown_function(test)
+    print("All simulator tests passed!")